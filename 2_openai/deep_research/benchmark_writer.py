@@ -0,0 +1,44 @@
+"""
+Write the same report with the single-shot writer and the map-reduce writer and compare them.
+The searches are planned and run once, so both writers work from identical search results.
+
+Run with: uv run benchmark_writer.py "your research topic"
+Raising HOW_MANY_SEARCHES in .env gives the writers more material, which is where map-reduce helps most.
+"""
+
+import asyncio
+import sys
+import time
+from dotenv import load_dotenv
+from research_manager import ResearchManager
+
+load_dotenv(override=True)
+
+DEFAULT_QUERY = "Latest AI Agent frameworks in 2025"
+
+
+async def write(mode: str, query: str, search_results: list[str]) -> tuple[float, float, int, int]:
+    """The time to the first partial output, total time, tokens and words for one writer"""
+    manager = ResearchManager(writer_mode=mode)
+    writer = manager.stream_report_map_reduce if mode == "map_reduce" else manager.stream_report
+    start = time.monotonic()
+    first = None
+    async for markdown, report in writer(query, search_results):
+        if first is None and markdown:
+            first = time.monotonic() - start
+    return first or 0.0, manager.writer_seconds, manager.writer_tokens, len(report.markdown_report.split())
+
+
+async def main(query: str) -> None:
+    manager = ResearchManager()
+    search_plan = await manager.plan_searches(query)
+    search_results = await manager.dispatch_searches(search_plan)
+    print(f"\nWriting from {len(search_results)} search results\n")
+    print(f"{'writer':<12}{'first output':>14}{'total':>10}{'tokens':>10}{'words':>8}")
+    for mode in ["single", "map_reduce"]:
+        first, seconds, tokens, words = await write(mode, query, search_results)
+        print(f"{mode:<12}{first:>13.1f}s{seconds:>9.1f}s{tokens:>10,}{words:>8,}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(" ".join(sys.argv[1:]) or DEFAULT_QUERY))
@@ -1,30 +1,63 @@
+import asyncio
 import gradio as gr
 from dotenv import load_dotenv
-from research_manager import ResearchManager
+from research_jobs import research_jobs, QUEUED, RUNNING, DONE
 
 load_dotenv(override=True)
 
+# How often an open page asks for its job's progress; each poll is a short request
+POLL_SECONDS = 1
 
-async def run(query: str):
-    async for chunk in ResearchManager().run(query):
-        yield chunk
+
+def describe(job) -> str:
+    if job.status == QUEUED:
+        return f"Job `{job.id}` is queued, {research_jobs.position(job)} ahead of it"
+    if job.status == RUNNING:
+        return f"Job `{job.id}` is running"
+    if job.status == DONE:
+        return f"Job `{job.id}` is complete"
+    return f"Job `{job.id}` {job.status}" + (f": {job.error}" if job.error else "")
+
+
+async def submit(query: str):
+    if not query.strip():
+        return "", "Enter a topic to research", gr.update()
+    try:
+        job = research_jobs.submit(query)
+    except asyncio.QueueFull:
+        return "", "The research queue is full right now, please try again in a few minutes", gr.update()
+    return job.id, describe(job), job.output
+
+
+async def poll(job_id: str):
+    job = research_jobs.get(job_id) if job_id else None
+    if not job:
+        return gr.update(), gr.update()
+    return describe(job), job.output
+
+
+async def cancel(job_id: str):
+    job = research_jobs.cancel(job_id) if job_id else None
+    return describe(job) if job else "No such job"
 
 
 with gr.Blocks(theme=gr.themes.Default(primary_hue="sky")) as ui:
     gr.Markdown("# Deep Research")
     query_textbox = gr.Textbox(label="What topic would you like to research?")
-    run_button = gr.Button("Run", variant="primary")
+    with gr.Row():
+        run_button = gr.Button("Run", variant="primary")
+        cancel_button = gr.Button("Cancel")
+    # Paste a job ID here to pick up a job started earlier or in another tab
+    job_id_textbox = gr.Textbox(label="Job ID")
+    status = gr.Markdown()
     gr.Markdown("# Output:")
     report = gr.Markdown(label="Report")
-    
-    run_button.click(fn=run, inputs=query_textbox, outputs=report, concurrency_limit=5)
-    query_textbox.submit(fn=run, inputs=query_textbox, outputs=report, concurrency_limit=5)
 
-# 2. Enable queuing and set max_threads in launch
-if __name__ == "__main__":
-    ui.queue().launch(
-        inbrowser=True,
-        max_threads=40,
-        show_api=False# Allows the underlying server to handle more simultaneous connections
-    )
+    run_button.click(fn=submit, inputs=query_textbox, outputs=[job_id_textbox, status, report])
+    query_textbox.submit(fn=submit, inputs=query_textbox, outputs=[job_id_textbox, status, report])
+    cancel_button.click(fn=cancel, inputs=job_id_textbox, outputs=status, queue=False)
+    timer = gr.Timer(value=POLL_SECONDS)
+    timer.tick(fn=poll, inputs=job_id_textbox, outputs=[status, report], show_progress="hidden", queue=False)
 
+if __name__ == "__main__":
+    ui.queue().launch(inbrowser=True, show_api=False)
@@ -0,0 +1,33 @@
+from pydantic import BaseModel, Field
+from agents import Agent
+
+HOW_MANY_SECTIONS = 5
+
+INSTRUCTIONS = (
+    "You are a senior researcher planning a report for a research query. "
+    "You will be provided with the original query and numbered search results from a research assistant.\n"
+    f"Come up with an outline of {HOW_MANY_SECTIONS} sections that together answer the query in depth, "
+    "without overlapping. For each section, list the numbers of the search results it should draw on."
+)
+
+
+class ReportSection(BaseModel):
+    heading: str = Field(description="The heading of the section.")
+
+    focus: str = Field(description="What the section should cover, and what it should leave to other sections.")
+
+    sources: list[int] = Field(description="The numbers of the search results this section should draw on.")
+
+
+class ReportOutline(BaseModel):
+    title: str = Field(description="The title of the report.")
+
+    sections: list[ReportSection] = Field(description="The sections of the report, in order.")
+
+
+outline_agent = Agent(
+    name="OutlineAgent",
+    instructions=INSTRUCTIONS,
+    model="gpt-4o-mini",
+    output_type=ReportOutline,
+)
@@ -1,7 +1,8 @@
+import os
 from pydantic import BaseModel, Field
 from agents import Agent
 
-HOW_MANY_SEARCHES = 2
+HOW_MANY_SEARCHES = int(os.getenv("HOW_MANY_SEARCHES", "2"))
 
 INSTRUCTIONS = f"You are a helpful research assistant. Given a query, come up with a set of web searches \
 to perform to best answer the query. Output {HOW_MANY_SEARCHES} terms to query for."
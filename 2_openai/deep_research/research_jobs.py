@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+from research_manager import ResearchManager
+
+load_dotenv(override=True)
+
+RESEARCH_WORKERS = int(os.getenv("RESEARCH_WORKERS", "4"))
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "500"))
+# Finished jobs are kept this long so their results can still be fetched by ID
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE = {QUEUED, RUNNING}
+
+
+@dataclass
+class Job:
+    id: str
+    query: str
+    status: str = QUEUED
+    # The latest markdown the research produced: progress, then the report as it is written
+    output: str = ""
+    error: str = ""
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+    task: asyncio.Task | None = None
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class ResearchJobQueue:
+    """
+    Runs research jobs on a fixed pool of worker tasks, so requests only submit a job and poll it.
+    Submitting a query that is already queued or running returns the existing job.
+    Workers start on the first submit, in the event loop serving the app.
+    """
+
+    def __init__(self, workers: int = RESEARCH_WORKERS, max_queued: int = MAX_QUEUED_JOBS):
+        self.worker_count = workers
+        self.queue: asyncio.Queue[Job] | None = None
+        self.max_queued = max_queued
+        self.jobs: dict[str, Job] = {}
+        self.active: dict[str, Job] = {}
+        self.workers: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        if not self.workers:
+            self.queue = asyncio.Queue(self.max_queued)
+            self.workers = [asyncio.create_task(self.work()) for _ in range(self.worker_count)]
+
+    def submit(self, query: str) -> Job:
+        """Queue a job for the query, or return the one already working on it; raises asyncio.QueueFull when busy"""
+        self.start()
+        self.expire()
+        key = normalize_query(query)
+        job = self.active.get(key)
+        if job and job.status in ACTIVE:
+            return job
+        job = Job(id=uuid.uuid4().hex[:12], query=query)
+        self.queue.put_nowait(job)
+        self.jobs[job.id] = job
+        self.active[key] = job
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id.strip())
+
+    def position(self, job: Job) -> int:
+        """How many jobs are ahead of this one in the queue"""
+        return sum(1 for other in self.jobs.values() if other.status == QUEUED and other.created_at < job.created_at)
+
+    def cancel(self, job_id: str) -> Job | None:
+        job = self.get(job_id)
+        if job and job.status in ACTIVE:
+            if job.task:
+                job.task.cancel()
+            self.finish(job, CANCELLED)
+        return job
+
+    def finish(self, job: Job, status: str, error: str = "") -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        key = normalize_query(job.query)
+        if self.active.get(key) is job:
+            del self.active[key]
+
+    def expire(self) -> None:
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [id for id, job in self.jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    async def run(self, job: Job) -> None:
+        async for chunk in ResearchManager().run(job.query):
+            job.output = chunk
+
+    async def work(self) -> None:
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.status != QUEUED:
+                    continue
+                job.status = RUNNING
+                job.task = asyncio.create_task(self.run(job))
+                await job.task
+                self.finish(job, DONE)
+            except asyncio.CancelledError:
+                if job.status != CANCELLED:
+                    raise
+            except Exception as e:
+                print(f"Research job {job.id} failed: {e}")
+                self.finish(job, FAILED, str(e))
+            finally:
+                job.task = None
+                self.queue.task_done()
+
+
+research_jobs = ResearchJobQueue()
@@ -1,25 +1,94 @@
 from agents import Runner, trace, gen_trace_id
+from openai.types.responses import ResponseTextDeltaEvent
 from search_agent import search_agent
 from planner_agent import planner_agent, WebSearchItem, WebSearchPlan
 from writer_agent import writer_agent, ReportData
+from outline_agent import outline_agent, ReportOutline, ReportSection
+from section_writer_agent import section_writer_agent
+from editor_agent import editor_agent
 from email_agent import email_agent
 from email_writer_agent import email_writer_agent, EmailContent
+from search_cache import get_search_cache, SearchStats
+from search_dispatcher import SearchDispatcher
 import asyncio
+import json
+import os
+import re
+import time
+
+# The UI re-renders the whole markdown on every update, so streamed tokens are batched up to this often
+STREAM_UPDATE_SECONDS = 0.25
+
+# "single" writes the report in one call; "map_reduce" outlines it, drafts the sections in parallel, then edits
+WRITER_MODE = os.getenv("WRITER_MODE", "single")
+
+INCOMPLETE_ESCAPE = re.compile(r"\\u[0-9a-fA-F]{0,3}$")
+
+
+def partial_json_string(buffer: str, key: str) -> str:
+    """ The value of a string field in a JSON object that is still streaming in, as much of it as has arrived """
+    match = re.search(rf'"{key}"\s*:\s*"', buffer)
+    if not match:
+        return ""
+    raw = buffer[match.end():]
+    # Stop at the closing quote, if it has arrived: the first quote not escaped by an odd run of backslashes
+    end = re.search(r'(?<!\\)(?:\\\\)*"', raw)
+    if end:
+        raw = raw[: end.end() - 1]
+    else:
+        raw = INCOMPLETE_ESCAPE.sub("", raw)
+        if (len(raw) - len(raw.rstrip("\\"))) % 2:
+            raw = raw[:-1]
+    return json.loads(f'"{raw}"', strict=False)
+
 
 class ResearchManager:
 
+    def __init__(self, writer_mode: str = WRITER_MODE):
+        self.writer_mode = writer_mode
+        self.status: list[str] = []
+        self.search_stats = SearchStats()
+        # Tokens each search took, or took when it was cached, to credit the duplicates that reused it
+        self.search_tokens: dict[str, int] = {}
+        # Searches that produced nothing by the deadline, as (query, reason)
+        self.dropped: list[tuple[str, str]] = []
+        # What writing the report took, for comparing the writer modes
+        self.writer_seconds = 0.0
+        self.writer_tokens = 0
+
+    def render(self, report: str = "") -> str:
+        """ The progress so far as markdown, followed by as much of the report as has been written """
+        progress = "\n".join(f"- {line}" for line in self.status)
+        return f"{progress}\n\n{report}" if report else progress
+
     async def run(self, query: str):
-        """ Run the deep research process, yielding the status updates and the final report"""
+        """ Run the deep research process, yielding the progress and the report as it is written """
         trace_id = gen_trace_id()
         with trace("Research trace", trace_id=trace_id):
             print(f"View trace: https://platform.openai.com/traces/trace?trace_id={trace_id}")
-            yield f"View trace: https://platform.openai.com/traces/trace?trace_id={trace_id}"
+            self.status.append(f"View trace: https://platform.openai.com/traces/trace?trace_id={trace_id}")
+            self.status.append("Planning searches...")
+            yield self.render()
             print("Starting research...")
             search_plan = await self.plan_searches(query)
-            yield "Searches planned, starting to search..."     
-            search_results = await self.dispatch_searches(search_plan)
-            yield "Searches complete, writing report..."
-            report = await self.write_report(query, search_results)
+            self.status[-1] = f"Searches planned, running {len(search_plan.searches)} searches..."
+            yield self.render()
+            search_results = []
+            async for done, total, item, result in self.stream_searches(search_plan):
+                if result is not None:
+                    self.status.append(f"Search {done}/{total} done: {item.query}")
+                    search_results.append(result)
+                else:
+                    self.status.append(f"Search {done}/{total} dropped ({self.dropped[-1][1]}): {item.query}")
+                yield self.render()
+            self.status.append(self.search_stats.summary())
+            self.status.append("Searches complete, writing report...")
+            yield self.render()
+            report = None
+            writer = self.stream_report_map_reduce if self.writer_mode == "map_reduce" else self.stream_report
+            async for markdown, report in writer(query, search_results):
+                yield self.render(markdown)
+            print(f"The {self.writer_mode} writer took {self.writer_seconds:.1f}s and {self.writer_tokens:,} tokens")
             # yield "Report written, preparing email..."
             # email_content = await self.prepare_email(report.model_dump_json())
             # yield "Sending Email..."
@@ -38,47 +107,134 @@ class ResearchManager:
         print(f"Will perform {len(result.final_output.searches)} searches")
         return result.final_output_as(WebSearchPlan)
 
+    async def stream_searches(self, search_plan: WebSearchPlan):
+        """ Run the distinct searches concurrently, yielding (number completed, total, item, result) as each finishes """
+        print("Searching...")
+        queries = [item.query for item in search_plan.searches]
+        duplicate_of = await get_search_cache().deduplicate(queries)
+        items = [item for item, duplicate in zip(search_plan.searches, duplicate_of) if duplicate is None]
+        self.search_stats.duplicates += len(queries) - len(items)
+        self.search_stats.searches += len(items)
+        done = 0
+        async for outcome in SearchDispatcher(self.search).stream(items):
+            done += 1
+            if outcome.reason is not None:
+                self.dropped.append((outcome.item.query, outcome.reason))
+                print(f"Dropped search {outcome.item.query}: {outcome.reason}")
+            print(f"Searching... {done}/{len(items)} completed")
+            yield done, len(items), outcome.item, outcome.result
+        for duplicate in duplicate_of:
+            if duplicate is not None:
+                self.search_stats.tokens_saved += self.search_tokens.get(queries[duplicate], 0)
+
     async def dispatch_searches(self, search_plan: WebSearchPlan) -> list[str]:
         """ Dispatch the searches to perform search for the query """
-        print("Searching...")
-        # num_completed = 0
-        tasks = [asyncio.create_task(self.search(item)) for item in search_plan.searches]
-        results = []
-        # for task in asyncio.as_completed(tasks):
-        #     result = await task
-        #     if result is not None:
-        #         results.append(result)
-        #     num_completed += 1
-        #     print(f"Searching... {num_completed}/{len(tasks)} completed")
-        # print("Finished searching")
-        raw_results = await asyncio.gather(*tasks)
-        results = [r for r in raw_results if r is not None]
+        results = [result async for _, _, _, result in self.stream_searches(search_plan) if result is not None]
         print(f"Finished doing research. Did {len(results)} searches out of {len(search_plan.searches)} subjects.")
         return results
 
-    async def search(self, item: WebSearchItem) -> str | None:
-        """ Perform a search for the query """
+    async def search(self, item: WebSearchItem) -> str:
+        """ Perform a search for the query, reusing the summary of the same or a similar recent search """
+        cached = await get_search_cache().lookup(item.query)
+        if cached:
+            summary, tokens, similar = cached
+            self.search_stats.hits += 1
+            self.search_stats.similar_hits += similar
+            self.search_stats.tokens_saved += tokens
+            self.search_tokens[item.query] = tokens
+            return summary
         input = f"Search term: {item.query}\nReason for searching: {item.reason}"
-        try:
-            result = await Runner.run(
-                search_agent,
-                input,
-            )
-            return str(result.final_output)
-        except Exception:
-            return None
-
-    async def write_report(self, query: str, search_results: list[str]) -> ReportData:
-        """ Write the report for the query """
-        print("Thinking about report...")
-        input = f"Original query: {query}\nSummarized search results: {search_results}"
         result = await Runner.run(
-            writer_agent,
+            search_agent,
             input,
         )
+        summary = str(result.final_output)
+        tokens = result.context_wrapper.usage.total_tokens
+        self.search_stats.tokens_used += tokens
+        self.search_tokens[item.query] = tokens
+        await get_search_cache().store(item.query, summary, tokens)
+        return summary
+
+    async def stream_report(self, query: str, search_results: list[str]):
+        """ Write the report, yielding (markdown so far, None) as tokens arrive and finally (markdown, report) """
+        print("Thinking about report...")
+        start = time.monotonic()
+        input = f"Original query: {query}\nSummarized search results: {search_results}"
+        async for markdown, report in self.stream_writer(writer_agent, input):
+            if report:
+                print("Finished writing report")
+                self.writer_seconds += time.monotonic() - start
+            yield markdown, report
+
+    async def stream_writer(self, agent, input: str):
+        """ Run an agent that writes ReportData, yielding its markdown as it streams in and finally (markdown, report) """
+        result = Runner.run_streamed(agent, input)
+        buffer = ""
+        last_update = 0.0
+        async for event in result.stream_events():
+            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                buffer += event.data.delta
+                if time.monotonic() - last_update >= STREAM_UPDATE_SECONDS:
+                    last_update = time.monotonic()
+                    yield partial_json_string(buffer, "markdown_report"), None
+        self.writer_tokens += result.context_wrapper.usage.total_tokens
+        report = result.final_output_as(ReportData)
+        yield report.markdown_report, report
+
+    async def run_writer(self, agent, input: str):
+        result = await Runner.run(agent, input)
+        self.writer_tokens += result.context_wrapper.usage.total_tokens
+        return result
+
+    async def write_section(self, query: str, outline: ReportOutline, section: ReportSection, search_results: list[str]) -> str:
+        """ Draft one section, grounded on just the search results the outline assigned to it """
+        sources = [search_results[n - 1] for n in section.sources if 1 <= n <= len(search_results)] or search_results
+        headings = "\n".join(f"- {other.heading}" for other in outline.sections)
+        input = (
+            f"Original query: {query}\nReport outline:\n{headings}\n"
+            f"Section to write: {section.heading}\nFocus: {section.focus}\nSearch results: {sources}"
+        )
+        result = await self.run_writer(section_writer_agent, input)
+        return str(result.final_output)
+
+    async def stream_report_map_reduce(self, query: str, search_results: list[str]):
+        """ Outline the report, draft its sections in parallel and then edit the drafts into one report.
+        Yields (markdown so far, None) as each section is drafted and the edit streams in, and finally (markdown, report) """
+        print("Outlining report...")
+        start = time.monotonic()
+        numbered = "\n\n".join(f"[{i}] {result}" for i, result in enumerate(search_results, start=1))
+        result = await self.run_writer(outline_agent, f"Original query: {query}\nSearch results:\n{numbered}")
+        outline = result.final_output_as(ReportOutline)
+        print(f"Drafting {len(outline.sections)} sections...")
+
+        async def draft(i: int, section: ReportSection):
+            try:
+                return i, await self.write_section(query, outline, section, search_results)
+            except Exception as e:
+                print(f"Could not draft section {section.heading}: {e}")
+                return i, ""
+
+        drafts: list[str | None] = [None] * len(outline.sections)
+        tasks = [asyncio.create_task(draft(i, section)) for i, section in enumerate(outline.sections)]
+        for task in asyncio.as_completed(tasks):
+            i, drafts[i] = await task
+            sections = [
+                text if text is not None else f"## {section.heading}\n\n*Writing...*"
+                for text, section in zip(drafts, outline.sections)
+                if text != ""
+            ]
+            yield f"# {outline.title}\n\n" + "\n\n".join(sections), None
+        body = "\n\n".join(text for text in drafts if text)
 
-        print("Finished writing report")
-        return result.final_output_as(ReportData)
+        print("Editing report...")
+        input = f"Original query: {query}\nTitle: {outline.title}\nSection drafts:\n\n{body}"
+        async for markdown, report in self.stream_writer(editor_agent, input):
+            if report:
+                print("Finished writing report")
+                self.writer_seconds += time.monotonic() - start
+            # The drafts stay on screen until the edited report has started to arrive
+            if markdown or report:
+                yield markdown, report
     
     async def prepare_email(self, report: ReportData) -> EmailContent:
         """Prepare an email to be fed to te send email agent"""
@@ -0,0 +1,175 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+import numpy as np
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+load_dotenv(override=True)
+
+# Kept beside this module rather than in whatever directory the research is run from
+SEARCH_CACHE_DB = os.getenv("SEARCH_CACHE_DB", os.path.join(os.path.dirname(__file__), "search_cache.db"))
+SEARCH_CACHE_TTL_HOURS = float(os.getenv("SEARCH_CACHE_TTL_HOURS", "24"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+# Queries whose embeddings are at least this similar are treated as the same search
+SEARCH_SIMILARITY_THRESHOLD = float(os.getenv("SEARCH_SIMILARITY_THRESHOLD", "0.92"))
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+STOP_WORDS = {"a", "an", "the", "of", "for", "in", "on", "and", "or", "to", "with", "about", "is", "are", "what", "how"}
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS searches (
+        normalized TEXT PRIMARY KEY,
+        query TEXT,
+        embedding BLOB,
+        result TEXT,
+        tokens INTEGER,
+        created_at REAL,
+        last_used REAL
+    )
+"""
+
+
+def normalize(query: str) -> str:
+    """Lowercase, drop punctuation and filler words, and sort the rest, so word order and phrasing don't matter"""
+    words = re.findall(r"[a-z0-9]+", query.lower())
+    return " ".join(sorted({word for word in words if word not in STOP_WORDS}))
+
+
+@dataclass
+class SearchStats:
+    searches: int = 0
+    hits: int = 0
+    similar_hits: int = 0
+    duplicates: int = 0
+    tokens_used: int = 0
+    tokens_saved: int = 0
+
+    def summary(self) -> str:
+        rate = self.hits / self.searches if self.searches else 0.0
+        return (
+            f"Search cache: {self.hits}/{self.searches} hits ({rate:.0%}, {self.similar_hits} by similarity), "
+            f"{self.duplicates} duplicate searches collapsed, ~{self.tokens_saved:,} tokens saved"
+        )
+
+
+class SearchCache:
+    """
+    Search summaries stored in SQLite, found by normalized query or, failing that, by the cosine
+    similarity of the query embeddings. Entries expire after the TTL, and the least recently
+    used are evicted beyond the size limit. If embeddings can't be fetched, only exact matches are used.
+    """
+
+    def __init__(self, path: str = SEARCH_CACHE_DB):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(CREATE_TABLE)
+        self.lock = threading.Lock()
+        self.client = None
+        self.embeddings: dict[str, np.ndarray] = {}
+
+    async def embed(self, queries: list[str]) -> list[np.ndarray | None]:
+        """Unit-length embeddings for the queries, fetched in one request and remembered"""
+        missing = [query for query in dict.fromkeys(queries) if query not in self.embeddings]
+        if missing:
+            try:
+                self.client = self.client or AsyncOpenAI()
+                response = await self.client.embeddings.create(model=EMBEDDING_MODEL, input=missing)
+                for query, item in zip(missing, response.data):
+                    vector = np.array(item.embedding, dtype=np.float32)
+                    self.embeddings[query] = vector / np.linalg.norm(vector)
+            except Exception as e:
+                print(f"Could not embed search queries, matching exactly only: {e}")
+        return [self.embeddings.get(query) for query in queries]
+
+    def expire(self) -> None:
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM searches WHERE created_at < ?", (time.time() - SEARCH_CACHE_TTL_HOURS * 3600,))
+            self.conn.execute(
+                "DELETE FROM searches WHERE normalized NOT IN "
+                "(SELECT normalized FROM searches ORDER BY last_used DESC LIMIT ?)",
+                (SEARCH_CACHE_MAX_ENTRIES,),
+            )
+
+    async def lookup(self, query: str) -> tuple[str, int, bool] | None:
+        """The cached (result, tokens it took, whether it matched by similarity) for this query, if any"""
+        key = normalize(query)
+        cutoff = time.time() - SEARCH_CACHE_TTL_HOURS * 3600
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT result, tokens FROM searches WHERE normalized = ? AND created_at >= ?", (key, cutoff)
+            ).fetchone()
+        similar = False
+        if not row:
+            [vector] = await self.embed([query])
+            if vector is None:
+                return None
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT normalized, embedding FROM searches WHERE embedding IS NOT NULL AND created_at >= ?",
+                    (cutoff,),
+                ).fetchall()
+            if not rows:
+                return None
+            matrix = np.stack([np.frombuffer(embedding, dtype=np.float32) for _, embedding in rows])
+            scores = matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < SEARCH_SIMILARITY_THRESHOLD:
+                return None
+            key, similar = rows[best][0], True
+            with self.lock:
+                row = self.conn.execute("SELECT result, tokens FROM searches WHERE normalized = ?", (key,)).fetchone()
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE searches SET last_used = ? WHERE normalized = ?", (time.time(), key))
+        return row[0], row[1], similar
+
+    async def store(self, query: str, result: str, tokens: int) -> None:
+        [vector] = await self.embed([query])
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO searches (normalized, query, embedding, result, tokens, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (normalize(query), query, None if vector is None else vector.tobytes(), result, tokens, now, now),
+            )
+        self.expire()
+
+    async def deduplicate(self, queries: list[str]) -> list[int | None]:
+        """For each query, the index of an earlier query it duplicates, or None if it should run"""
+        vectors = await self.embed(queries)
+        keys = [normalize(query) for query in queries]
+        duplicate_of = []
+        kept = []
+        for i, (key, vector) in enumerate(zip(keys, vectors)):
+            match = next(
+                (
+                    j
+                    for j in kept
+                    if keys[j] == key
+                    or (
+                        vector is not None
+                        and vectors[j] is not None
+                        and float(vectors[j] @ vector) >= SEARCH_SIMILARITY_THRESHOLD
+                    )
+                ),
+                None,
+            )
+            duplicate_of.append(match)
+            if match is None:
+                kept.append(i)
+        return duplicate_of
+
+
+search_cache: SearchCache | None = None
+search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """The cache shared by every research run in this process, opened on first use"""
+    global search_cache
+    with search_cache_lock:
+        if search_cache is None:
+            search_cache = SearchCache()
+    return search_cache
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Any
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+MAX_CONCURRENT_SEARCHES = int(os.getenv("MAX_CONCURRENT_SEARCHES", "3"))
+SEARCH_TIMEOUT_SECONDS = float(os.getenv("SEARCH_TIMEOUT_SECONDS", "60"))
+SEARCHES_DEADLINE_SECONDS = float(os.getenv("SEARCHES_DEADLINE_SECONDS", "120"))
+# A search still running after this long gets a second, hedged attempt, and whichever finishes first wins
+SEARCH_HEDGE_AFTER_SECONDS = float(os.getenv("SEARCH_HEDGE_AFTER_SECONDS", "20"))
+SEARCH_MAX_ATTEMPTS = int(os.getenv("SEARCH_MAX_ATTEMPTS", "2"))
+# Hedges run in slots of their own, as the stragglers they hedge still hold the regular ones
+SEARCH_HEDGE_CONCURRENCY = int(os.getenv("SEARCH_HEDGE_CONCURRENCY", "1"))
+
+
+@dataclass
+class Outcome:
+    item: Any
+    result: Any = None
+    # Why the item was dropped, if it produced no result
+    reason: str | None = None
+    attempts: int = 0
+    seconds: float = 0.0
+
+
+class SearchDispatcher:
+    """
+    Runs an async function over many items with a concurrency cap, a timeout per attempt
+    and an overall deadline. A failed attempt is retried straight away and a straggler is hedged
+    with a parallel attempt, up to max_attempts; hedges have their own, smaller concurrency cap. Outcomes are yielded as they finish; whatever is
+    still running at the deadline is cancelled and reported as dropped.
+    """
+
+    def __init__(
+        self,
+        run,
+        concurrency: int = MAX_CONCURRENT_SEARCHES,
+        attempt_timeout: float = SEARCH_TIMEOUT_SECONDS,
+        deadline: float = SEARCHES_DEADLINE_SECONDS,
+        hedge_after: float = SEARCH_HEDGE_AFTER_SECONDS,
+        max_attempts: int = SEARCH_MAX_ATTEMPTS,
+        hedge_concurrency: int = SEARCH_HEDGE_CONCURRENCY,
+    ):
+        self.run = run
+        self.concurrency = concurrency
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.max_attempts = max_attempts
+        self.hedge_concurrency = hedge_concurrency
+
+    async def attempt(self, item, semaphore: asyncio.Semaphore, deadline: float, started: asyncio.Event):
+        async with semaphore:
+            started.set()
+            timeout = min(self.attempt_timeout, deadline - time.monotonic())
+            try:
+                async with asyncio.timeout(timeout):
+                    return await self.run(item)
+            except TimeoutError:
+                raise TimeoutError(f"timed out after {timeout:.1f}s") from None
+
+    async def run_item(
+        self, item, semaphore: asyncio.Semaphore, hedge_semaphore: asyncio.Semaphore, deadline: float
+    ) -> Outcome:
+        start = time.monotonic()
+        started = asyncio.Event()
+        running = {asyncio.create_task(self.attempt(item, semaphore, deadline, started))}
+        attempts = 1
+        errors = []
+        try:
+            # Time spent queued for a slot doesn't make a straggler, so the hedge clock starts with the first attempt
+            waiter = asyncio.create_task(started.wait())
+            await asyncio.wait(running | {waiter}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            while running:
+                can_hedge = attempts < self.max_attempts
+                done, running = await asyncio.wait(
+                    running, timeout=self.hedge_after if can_hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return Outcome(item, task.result(), attempts=attempts, seconds=time.monotonic() - start)
+                    error = task.exception()
+                    errors.append(str(error) or type(error).__name__)
+                # Either every attempt so far failed and this retry takes a regular slot,
+                # or the ones still running are straggling and this hedge takes a hedge slot
+                if can_hedge and time.monotonic() < deadline:
+                    slots = hedge_semaphore if running else semaphore
+                    running.add(asyncio.create_task(self.attempt(item, slots, deadline, started)))
+                    attempts += 1
+            return Outcome(item, reason="; ".join(errors), attempts=attempts, seconds=time.monotonic() - start)
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def stream(self, items: list):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        hedge_semaphore = asyncio.Semaphore(self.hedge_concurrency)
+        deadline = time.monotonic() + self.deadline
+        pending = {
+            asyncio.create_task(self.run_item(item, semaphore, hedge_semaphore, deadline)): item for item in items
+        }
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, timeout=max(0.0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for task in done:
+                    del pending[task]
+                    yield task.result()
+            for item in pending.values():
+                yield Outcome(item, reason=f"overall deadline of {self.deadline:g}s reached", seconds=self.deadline)
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
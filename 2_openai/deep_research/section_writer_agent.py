@@ -0,0 +1,16 @@
+from agents import Agent
+
+INSTRUCTIONS = (
+    "You are a senior researcher writing one section of a longer report. "
+    "You will be provided with the original query, the report outline, the section to write and the search "
+    "results it should draw on.\n"
+    "Write only that section, in markdown, starting with its heading as a level 2 heading. "
+    "Stay within the section's focus; the other sections are being written at the same time. "
+    "Be detailed and specific, aiming for 300-500 words."
+)
+
+section_writer_agent = Agent(
+    name="SectionWriterAgent",
+    instructions=INSTRUCTIONS,
+    model="gpt-4o-mini",
+)
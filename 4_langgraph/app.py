@@ -5,18 +5,32 @@ from sidekick import Sidekick
 async def setup():
     sidekick = Sidekick()
     await sidekick.setup()
-    return sidekick
+    return sidekick, sidekick.sidekick_id
 
 
 async def process_message(sidekick, message, success_criteria, history):
-    results = await sidekick.run_superstep(message, success_criteria, history)
-    return results, sidekick
+    async for results in sidekick.stream_superstep(message, success_criteria, history):
+        yield results, sidekick, gr.update()
+    yield results, sidekick, sidekick.usage.report()
 
 
-async def reset():
+async def reset(sidekick):
+    free_resources(sidekick)
     new_sidekick = Sidekick()
     await new_sidekick.setup()
-    return "", "", None, new_sidekick
+    return "", "", None, new_sidekick, new_sidekick.sidekick_id
+
+
+async def resume(sidekick, session_id):
+    session_id = session_id.strip()
+    if not session_id or (sidekick and session_id == sidekick.sidekick_id):
+        return gr.update(), sidekick
+    resumed = Sidekick(session_id)
+    await resumed.setup()
+    if not await resumed.memory.exists(session_id):
+        gr.Warning(f"No saved session {session_id}; starting it fresh")
+    free_resources(sidekick)
+    return await resumed.history(), resumed
 
 
 def free_resources(sidekick):
@@ -34,6 +48,7 @@ with gr.Blocks(title="Sidekick", theme=gr.themes.Default(primary_hue="emerald"))
 
     with gr.Row():
         chatbot = gr.Chatbot(label="Sidekick", height=300, type="messages")
+    usage = gr.Markdown()
     with gr.Group():
         with gr.Row():
             message = gr.Textbox(show_label=False, placeholder="Your request to the Sidekick")
@@ -44,18 +59,23 @@ with gr.Blocks(title="Sidekick", theme=gr.themes.Default(primary_hue="emerald"))
     with gr.Row():
         reset_button = gr.Button("Reset", variant="stop")
         go_button = gr.Button("Go!", variant="primary")
+    with gr.Row():
+        # Conversations are saved, so pasting the ID of an earlier session picks it back up
+        session_id = gr.Textbox(label="Session ID", scale=4)
+        resume_button = gr.Button("Resume", scale=1)
 
-    ui.load(setup, [], [sidekick])
+    ui.load(setup, [], [sidekick, session_id])
     message.submit(
-        process_message, [sidekick, message, success_criteria, chatbot], [chatbot, sidekick]
+        process_message, [sidekick, message, success_criteria, chatbot], [chatbot, sidekick, usage]
     )
     success_criteria.submit(
-        process_message, [sidekick, message, success_criteria, chatbot], [chatbot, sidekick]
+        process_message, [sidekick, message, success_criteria, chatbot], [chatbot, sidekick, usage]
     )
     go_button.click(
-        process_message, [sidekick, message, success_criteria, chatbot], [chatbot, sidekick]
+        process_message, [sidekick, message, success_criteria, chatbot], [chatbot, sidekick, usage]
     )
-    reset_button.click(reset, [], [message, success_criteria, chatbot, sidekick])
+    reset_button.click(reset, [sidekick], [message, success_criteria, chatbot, sidekick, session_id])
+    resume_button.click(resume, [sidekick, session_id], [chatbot, sidekick])
 
 
 ui.launch(inbrowser=True)
@@ -0,0 +1,147 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+
+load_dotenv(override=True)
+
+# Sessions with an open browser context at once; each context is a fraction of a browser's memory
+MAX_BROWSER_CONTEXTS = int(os.getenv("MAX_BROWSER_CONTEXTS", "20"))
+# A session's context is closed after this long unused, and reopened, empty, if it browses again
+BROWSER_IDLE_SECONDS = float(os.getenv("BROWSER_IDLE_SECONDS", "600"))
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "true").lower() != "false"
+CONTEXT_WAIT_SECONDS = 30
+REAP_INTERVAL_SECONDS = 30
+
+
+class SessionBrowser(Browser):
+    """
+    Stands in for the Browser given to the Playwright tools, so a session only ever sees its own
+    context in the shared browser. The context is opened from the pool on first use, and opened
+    again if it was reaped or the browser crashed.
+    """
+
+    def __init__(self, pool: "BrowserPool"):
+        # The tools require a Browser, but everything they use is overridden, so there is no browser to wrap
+        self.pool = pool
+        self.context: BrowserContext | None = None
+        self.last_used = time.monotonic()
+
+    def __repr__(self) -> str:
+        return f"<SessionBrowser context={'open' if self.context else 'closed'}>"
+
+    __str__ = __repr__
+
+    @property
+    def contexts(self) -> list[BrowserContext]:
+        self.last_used = time.monotonic()
+        return [self.context] if self.context else []
+
+    def is_connected(self) -> bool:
+        return self.pool.browser is not None and self.pool.browser.is_connected()
+
+    async def new_context(self, **kwargs) -> BrowserContext:
+        self.last_used = time.monotonic()
+        self.context = await self.pool.open_context(self, **kwargs)
+        return self.context
+
+    async def close(self, **kwargs) -> None:
+        await self.pool.release(self)
+
+
+class BrowserPool:
+    """
+    One headless Chromium shared by every Sidekick session in the process, each session browsing
+    in its own isolated context. The browser is launched on first use and relaunched if it crashes,
+    the number of open contexts is capped, and contexts left idle are closed.
+    """
+
+    def __init__(self, max_contexts: int = MAX_BROWSER_CONTEXTS, idle_seconds: float = BROWSER_IDLE_SECONDS):
+        self.max_contexts = max_contexts
+        self.idle_seconds = idle_seconds
+        self.playwright: Playwright | None = None
+        self.browser: Browser | None = None
+        self.open: dict[SessionBrowser, BrowserContext] = {}
+        self.slots = asyncio.Semaphore(max_contexts)
+        self.lock = asyncio.Lock()
+        self.reaper: asyncio.Task | None = None
+
+    def session(self) -> SessionBrowser:
+        """A browser for one session's tools; nothing is launched until it is first used"""
+        return SessionBrowser(self)
+
+    async def get_browser(self) -> Browser:
+        async with self.lock:
+            if not self.browser or not self.browser.is_connected():
+                if not self.playwright:
+                    self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(headless=BROWSER_HEADLESS)
+                self.browser.on("disconnected", self.disconnected)
+            if not self.reaper:
+                self.reaper = asyncio.create_task(self.reap())
+            return self.browser
+
+    def disconnected(self, browser: Browser) -> None:
+        if browser is self.browser:
+            print("The shared browser disconnected; it will be relaunched when next needed")
+            self.browser = None
+            for session in list(self.open):
+                self.forget(session, self.open[session])
+
+    def forget(self, session: SessionBrowser, context: BrowserContext) -> None:
+        """Free the session's slot, unless it has since opened a different context"""
+        if self.open.get(session) is context:
+            del self.open[session]
+            session.context = None
+            self.slots.release()
+
+    async def open_context(self, session: SessionBrowser, **kwargs) -> BrowserContext:
+        if session in self.open:
+            return self.open[session]
+        try:
+            async with asyncio.timeout(CONTEXT_WAIT_SECONDS):
+                await self.slots.acquire()
+        except TimeoutError:
+            raise RuntimeError(f"All {self.max_contexts} browser sessions are in use; try again shortly") from None
+        try:
+            browser = await self.get_browser()
+            context = await browser.new_context(**kwargs)
+        except BaseException:
+            self.slots.release()
+            raise
+        context.on("close", lambda closed: self.forget(session, closed))
+        self.open[session] = context
+        return context
+
+    async def release(self, session: SessionBrowser) -> None:
+        context = self.open.get(session)
+        if context:
+            self.forget(session, context)
+            try:
+                await context.close()
+            except Exception as e:
+                print(f"Could not close a browser context: {e}")
+
+    async def reap(self) -> None:
+        while True:
+            await asyncio.sleep(REAP_INTERVAL_SECONDS)
+            cutoff = time.monotonic() - self.idle_seconds
+            for session in [session for session in self.open if session.last_used < cutoff]:
+                await self.release(session)
+
+    async def close(self) -> None:
+        if self.reaper:
+            self.reaper.cancel()
+            self.reaper = None
+        for session in list(self.open):
+            await self.release(session)
+        if self.browser:
+            await self.browser.close()
+            self.browser = None
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+
+browser_pool = BrowserPool()
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import time
+import aiosqlite
+from dotenv import load_dotenv
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+load_dotenv(override=True)
+
+SIDEKICK_DB = os.getenv("SIDEKICK_DB", "sidekick.db")
+# Only the latest checkpoint is needed to resume a conversation; a few more are kept for inspecting recent steps
+CHECKPOINTS_PER_THREAD = int(os.getenv("CHECKPOINTS_PER_THREAD", "10"))
+# Conversations untouched for this long are deleted
+THREAD_TTL_HOURS = float(os.getenv("THREAD_TTL_HOURS", "168"))
+EXPIRE_INTERVAL_SECONDS = 600
+
+CREATE_THREADS = """
+    CREATE TABLE IF NOT EXISTS threads (
+        thread_id TEXT PRIMARY KEY,
+        updated_at REAL
+    )
+"""
+
+PRUNE_CHECKPOINTS = """
+    DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id NOT IN (
+        SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? ORDER BY checkpoint_id DESC LIMIT ?
+    )
+"""
+
+PRUNE_WRITES = """
+    DELETE FROM writes WHERE thread_id = ? AND checkpoint_id NOT IN (
+        SELECT checkpoint_id FROM checkpoints WHERE thread_id = ?
+    )
+"""
+
+
+class SidekickCheckpointer(AsyncSqliteSaver):
+    """
+    The SQLite checkpointer, in WAL mode, with each conversation thread pruned to its latest
+    checkpoints and whole threads deleted once they have been idle past the TTL,
+    so the database stays a steady size however long the Sidekick runs.
+    """
+
+    def __init__(self, conn: aiosqlite.Connection):
+        super().__init__(conn)
+        self.last_expired = 0.0
+
+    async def setup(self) -> None:
+        # The saver calls setup() before every operation; only the first call has anything to do
+        already_setup = self.is_setup
+        await super().setup()
+        if already_setup:
+            return
+        async with self.lock:
+            await self.conn.execute("PRAGMA synchronous=NORMAL")
+            await self.conn.execute(CREATE_THREADS)
+            await self.conn.commit()
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        result = await super().aput(config, checkpoint, metadata, new_versions)
+        async with self.lock:
+            await self.conn.execute(
+                "INSERT OR REPLACE INTO threads (thread_id, updated_at) VALUES (?, ?)",
+                (str(config["configurable"]["thread_id"]), time.time()),
+            )
+            await self.conn.commit()
+        return result
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await super().adelete_thread(thread_id)
+        async with self.lock:
+            await self.conn.execute("DELETE FROM threads WHERE thread_id = ?", (str(thread_id),))
+            await self.conn.commit()
+
+    async def exists(self, thread_id: str) -> bool:
+        await self.setup()
+        async with self.lock, self.conn.execute("SELECT 1 FROM threads WHERE thread_id = ?", (thread_id,)) as cursor:
+            return await cursor.fetchone() is not None
+
+    async def prune(self, thread_id: str, keep: int = CHECKPOINTS_PER_THREAD) -> None:
+        """Delete all but the latest checkpoints of this thread, and expire idle threads if it is time to"""
+        async with self.lock:
+            await self.conn.execute(PRUNE_CHECKPOINTS, (thread_id, thread_id, keep))
+            await self.conn.execute(PRUNE_WRITES, (thread_id, thread_id))
+            await self.conn.commit()
+        if time.monotonic() - self.last_expired > EXPIRE_INTERVAL_SECONDS:
+            await self.expire()
+
+    async def expire(self) -> None:
+        self.last_expired = time.monotonic()
+        cutoff = time.time() - THREAD_TTL_HOURS * 3600
+        async with self.lock:
+            async with self.conn.execute("SELECT thread_id FROM threads WHERE updated_at < ?", (cutoff,)) as cursor:
+                expired = [row[0] async for row in cursor]
+        for thread_id in expired:
+            await self.adelete_thread(thread_id)
+        async with self.lock:
+            # Fold the write-ahead log back into the database so it doesn't grow between restarts
+            await self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if expired:
+            print(f"Expired {len(expired)} idle Sidekick conversations")
+
+
+checkpointer: SidekickCheckpointer | None = None
+checkpointer_lock = asyncio.Lock()
+
+
+async def get_checkpointer() -> SidekickCheckpointer:
+    """The checkpointer shared by every Sidekick in this process, opened on first use"""
+    global checkpointer
+    async with checkpointer_lock:
+        if checkpointer is None:
+            conn = aiosqlite.connect(SIDEKICK_DB)
+            # The connection runs on its own thread; as a daemon it doesn't keep the process alive at exit
+            conn.daemon = True
+            await conn
+            checkpointer = SidekickCheckpointer(conn)
+            await checkpointer.setup()
+            await checkpointer.expire()
+    return checkpointer
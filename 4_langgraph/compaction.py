@@ -0,0 +1,68 @@
+import os
+from dataclasses import dataclass, field
+from typing import Any, List, Tuple
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage
+
+load_dotenv(override=True)
+
+# The latest user turns are kept word for word; anything older is folded into a rolling summary
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "2"))
+# Tool outputs beyond this many characters, such as page dumps, keep only their start and end
+TOOL_OUTPUT_MAX_CHARS = int(os.getenv("TOOL_OUTPUT_MAX_CHARS", "6000"))
+
+SUMMARY_INSTRUCTIONS = """You maintain the running summary of a conversation between a user and an assistant that uses tools.
+Update the summary with the messages below, keeping the user's requests and preferences, what the assistant found and did,
+any files written, decisions made and questions still open. Leave out pleasantries and raw tool output.
+Reply with the updated summary only, in at most 300 words."""
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def digest(text: str, limit: int = TOOL_OUTPUT_MAX_CHARS) -> str:
+    """The start and end of a long text, with a note of how much was left out"""
+    if len(text) <= limit:
+        return text
+    head = limit * 3 // 4
+    tail = limit - head
+    return f"{text[:head]}\n\n[... {len(text) - limit:,} characters omitted ...]\n\n{text[-tail:]}"
+
+
+def split_turns(messages: List[Any], keep: int = CONTEXT_KEEP_TURNS) -> Tuple[List[Any], List[Any]]:
+    """Split the messages into the older ones and the last `keep` turns, each starting with a user message"""
+    starts = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    if len(starts) <= keep:
+        return [], messages
+    cut = starts[-keep] if keep else len(messages)
+    return messages[:cut], messages[cut:]
+
+
+def transcript(messages: List[Any]) -> str:
+    """The messages as plain text for the summarizer, with tool outputs cut right down"""
+    lines = []
+    for message in messages:
+        if message.content:
+            text = str(message.content)
+            lines.append(f"{message.type}: {digest(text, 500) if message.type == 'tool' else text}")
+    return "\n".join(lines)
+
+
+@dataclass
+class TokenUsage:
+    """Tokens used by each node's model calls, and an estimate of the tokens trimmed from the context"""
+
+    tokens: dict[str, int] = field(default_factory=dict)
+    calls: dict[str, int] = field(default_factory=dict)
+    trimmed: int = 0
+
+    def record(self, node: str, message: Any) -> None:
+        usage = getattr(message, "usage_metadata", None)
+        self.calls[node] = self.calls.get(node, 0) + 1
+        if usage:
+            self.tokens[node] = self.tokens.get(node, 0) + usage["total_tokens"]
+
+    def report(self) -> str:
+        nodes = ", ".join(f"{node} {self.tokens.get(node, 0):,} in {calls} calls" for node, calls in self.calls.items())
+        return f"Tokens used: {nodes or 'none yet'}. Context trimmed by ~{self.trimmed:,} tokens"
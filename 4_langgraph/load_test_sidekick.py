@@ -0,0 +1,96 @@
+"""
+Run many Sidekick sessions at once against stand-in models that take a fixed time to answer,
+once with the old synchronous worker and evaluator nodes and once with the async ones,
+and report the throughput and how long the event loop was stalled.
+
+Run with: uv run load_test_sidekick.py [sessions]
+No model or browser is used, and the conversations are saved to a temporary database.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ["SIDEKICK_DB"] = os.path.join(tempfile.mkdtemp(), "load_test.db")
+os.environ.setdefault("SERPER_API_KEY", "unused")
+
+from langchain_core.messages import AIMessage  # noqa: E402
+from sidekick import Sidekick, EvaluatorOutput  # noqa: E402
+from checkpoints import get_checkpointer  # noqa: E402
+
+SESSIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+MODEL_SECONDS = 0.5
+
+
+class StandInModel:
+    """Answers after MODEL_SECONDS, blocking its thread when called synchronously as a real client would"""
+
+    def __init__(self, output):
+        self.output = output
+
+    def invoke(self, messages):
+        time.sleep(MODEL_SECONDS)
+        return self.output
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(MODEL_SECONDS)
+        return self.output
+
+
+class BlockingSidekick(Sidekick):
+    """The worker and evaluator nodes as they were, calling the models synchronously"""
+
+    def worker(self, state):
+        return {"messages": [self.worker_llm_with_tools.invoke(self.worker_messages(state))]}
+
+    def evaluator(self, state):
+        return self.evaluation(self.evaluator_llm_with_output.invoke(self.evaluator_messages(state)))
+
+
+async def make_sidekick(cls) -> Sidekick:
+    sidekick = cls()
+    sidekick.tools = []
+    sidekick.memory = await get_checkpointer()
+    sidekick.worker_llm_with_tools = StandInModel(AIMessage(content="Here is the answer"))
+    sidekick.evaluator_llm_with_output = StandInModel(
+        {
+            "raw": AIMessage(content=""),
+            "parsed": EvaluatorOutput(feedback="Looks good", success_criteria_met=True, user_input_needed=False),
+            "parsing_error": None,
+        }
+    )
+    await sidekick.build_graph()
+    return sidekick
+
+
+async def watch_loop(stalls: list[float], interval: float = 0.01) -> None:
+    """Record how much later than asked for the event loop wakes up"""
+    while True:
+        start = time.monotonic()
+        await asyncio.sleep(interval)
+        stalls.append(time.monotonic() - start - interval)
+
+
+async def load_test(cls) -> tuple[float, float, float]:
+    sidekicks = [await make_sidekick(cls) for _ in range(SESSIONS)]
+    stalls = []
+    watcher = asyncio.create_task(watch_loop(stalls))
+    start = time.monotonic()
+    await asyncio.gather(*(sidekick.run_superstep("What is 2+2?", "", []) for sidekick in sidekicks))
+    seconds = time.monotonic() - start
+    watcher.cancel()
+    return seconds, SESSIONS / seconds, max(stalls, default=0.0)
+
+
+async def main() -> None:
+    print(f"{SESSIONS} concurrent sessions, each model call taking {MODEL_SECONDS}s\n")
+    print(f"{'nodes':<8}{'total':>9}{'sessions/s':>12}{'worst loop stall':>18}")
+    for name, cls in [("sync", BlockingSidekick), ("async", Sidekick)]:
+        seconds, throughput, stall = await load_test(cls)
+        print(f"{name:<8}{seconds:>8.1f}s{throughput:>12.1f}{stall * 1000:>16.0f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
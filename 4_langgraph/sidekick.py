@@ -5,11 +5,13 @@ from langgraph.graph.message import add_messages
 from dotenv import load_dotenv
 from langgraph.prebuilt import ToolNode
 from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage, RemoveMessage
+from langchain_core.runnables import RunnableConfig
 from typing import List, Any, Optional, Dict
 from pydantic import BaseModel, Field
 from sidekick_tools import playwright_tools, other_tools
+from checkpoints import get_checkpointer
+from compaction import SUMMARY_INSTRUCTIONS, TokenUsage, digest, estimate_tokens, split_turns, transcript
 import uuid
 import asyncio
 from datetime import datetime
@@ -23,6 +25,8 @@ class State(TypedDict):
     feedback_on_work: Optional[str]
     success_criteria_met: bool
     user_input_needed: bool
+    # What happened in the turns that have been compacted out of the messages
+    summary: Optional[str]
 
 
 class EvaluatorOutput(BaseModel):
@@ -34,27 +38,32 @@ class EvaluatorOutput(BaseModel):
 
 
 class Sidekick:
-    def __init__(self):
+    def __init__(self, sidekick_id: Optional[str] = None):
         self.worker_llm_with_tools = None
         self.evaluator_llm_with_output = None
+        self.summarizer_llm = None
         self.tools = None
+        self.tool_node = None
         self.llm_with_tools = None
         self.graph = None
-        self.sidekick_id = str(uuid.uuid4())
-        self.memory = MemorySaver()
+        # Also the conversation's thread ID, so passing an earlier one resumes that conversation
+        self.sidekick_id = sidekick_id or str(uuid.uuid4())
+        self.memory = None
         self.browser = None
-        self.playwright = None
+        self.usage = TokenUsage()
 
     async def setup(self):
-        self.tools, self.browser, self.playwright = await playwright_tools()
+        self.memory = await get_checkpointer()
+        self.tools, self.browser = await playwright_tools()
         self.tools += await other_tools()
         worker_llm = ChatOpenAI(model="gpt-4o-mini")
         self.worker_llm_with_tools = worker_llm.bind_tools(self.tools)
         evaluator_llm = ChatOpenAI(model="gpt-4o-mini")
-        self.evaluator_llm_with_output = evaluator_llm.with_structured_output(EvaluatorOutput)
+        self.evaluator_llm_with_output = evaluator_llm.with_structured_output(EvaluatorOutput, include_raw=True)
+        self.summarizer_llm = ChatOpenAI(model="gpt-4o-mini")
         await self.build_graph()
 
-    def worker(self, state: State) -> Dict[str, Any]:
+    def worker_messages(self, state: State) -> List[Any]:
         system_message = f"""You are a helpful assistant that can use tools to complete tasks.
     You keep working on a task until either you have a question or clarification for the user, or the success criteria is met.
     You have many tools to help you, including tools to browse the internet, navigating and retrieving web pages.
@@ -71,6 +80,11 @@ class Sidekick:
     If you've finished, reply with the final answer, and don't ask a question; simply reply with the answer.
     """
 
+        if state.get("summary"):
+            system_message += f"""
+    Earlier messages in this conversation have been summarized as:
+    {state["summary"]}"""
+
         if state.get("feedback_on_work"):
             system_message += f"""
     Previously you thought you completed the assignment, but your reply was rejected because the success criteria was not met.
@@ -89,9 +103,12 @@ class Sidekick:
 
         if not found_system_message:
             messages = [SystemMessage(content=system_message)] + messages
+        return messages
 
-        # Invoke the LLM with tools
-        response = self.worker_llm_with_tools.invoke(messages)
+    async def worker(self, state: State) -> Dict[str, Any]:
+        # Invoke the LLM with tools, without blocking the other sessions being served
+        response = await self.worker_llm_with_tools.ainvoke(self.worker_messages(state))
+        self.usage.record("worker", response)
 
         # Return updated state
         return {
@@ -106,8 +123,39 @@ class Sidekick:
         else:
             return "evaluator"
 
-    def format_conversation(self, messages: List[Any]) -> str:
+    async def tools_node(self, state: State, config: RunnableConfig) -> Dict[str, Any]:
+        """Run the tools, cutting long outputs down to a digest before they join the conversation"""
+        result = await self.tool_node.ainvoke(state, config)
+        for message in result["messages"]:
+            if isinstance(message, ToolMessage) and isinstance(message.content, str):
+                shortened = digest(message.content)
+                self.usage.trimmed += estimate_tokens(message.content) - estimate_tokens(shortened)
+                message.content = shortened
+        return result
+
+    async def compactor(self, state: State) -> Dict[str, Any]:
+        """Fold all but the latest turns into the rolling summary, so each call's context stays bounded"""
+        older, _ = split_turns(state["messages"])
+        if not older:
+            return {}
+        previous = state.get("summary") or "(none yet)"
+        response = await self.summarizer_llm.ainvoke(
+            [
+                SystemMessage(content=SUMMARY_INSTRUCTIONS),
+                HumanMessage(content=f"Current summary:\n{previous}\n\nMessages to add:\n{transcript(older)}"),
+            ]
+        )
+        self.usage.record("compactor", response)
+        self.usage.trimmed += estimate_tokens(transcript(older)) - estimate_tokens(response.content)
+        return {
+            "messages": [RemoveMessage(id=message.id) for message in older],
+            "summary": response.content,
+        }
+
+    def format_conversation(self, messages: List[Any], summary: Optional[str] = None) -> str:
         conversation = "Conversation history:\n\n"
+        if summary:
+            conversation += f"Summary of the earlier conversation: {summary}\n\n"
         for message in messages:
             if isinstance(message, HumanMessage):
                 conversation += f"User: {message.content}\n"
@@ -116,7 +164,7 @@ class Sidekick:
                 conversation += f"Assistant: {text}\n"
         return conversation
 
-    def evaluator(self, state: State) -> State:
+    def evaluator_messages(self, state: State) -> List[Any]:
         last_response = state["messages"][-1].content
 
         system_message = """You are an evaluator that determines if a task has been completed successfully by an Assistant.
@@ -126,7 +174,7 @@ class Sidekick:
         user_message = f"""You are evaluating a conversation between the User and Assistant. You decide what action to take based on the last response from the Assistant.
 
     The entire conversation with the assistant, with the user's original request and all replies, is:
-    {self.format_conversation(state["messages"])}
+    {self.format_conversation(state["messages"], state.get("summary"))}
 
     The success criteria for this assignment is:
     {state["success_criteria"]}
@@ -145,12 +193,16 @@ class Sidekick:
             user_message += f"Also, note that in a prior attempt from the Assistant, you provided this feedback: {state['feedback_on_work']}\n"
             user_message += "If you're seeing the Assistant repeating the same mistakes, then consider responding that user input is required."
 
-        evaluator_messages = [
+        return [
             SystemMessage(content=system_message),
             HumanMessage(content=user_message),
         ]
 
-        eval_result = self.evaluator_llm_with_output.invoke(evaluator_messages)
+    def evaluation(self, result: Dict[str, Any]) -> State:
+        self.usage.record("evaluator", result["raw"])
+        eval_result = result["parsed"]
+        if eval_result is None:
+            raise result["parsing_error"] or ValueError("The evaluator gave no verdict")
         new_state = {
             "messages": [
                 {
@@ -164,6 +216,10 @@ class Sidekick:
         }
         return new_state
 
+    async def evaluator(self, state: State) -> State:
+        result = await self.evaluator_llm_with_output.ainvoke(self.evaluator_messages(state))
+        return self.evaluation(result)
+
     def route_based_on_evaluation(self, state: State) -> str:
         if state["success_criteria_met"] or state["user_input_needed"]:
             return "END"
@@ -175,8 +231,10 @@ class Sidekick:
         graph_builder = StateGraph(State)
 
         # Add nodes
+        self.tool_node = ToolNode(tools=self.tools)
+        graph_builder.add_node("compactor", self.compactor)
         graph_builder.add_node("worker", self.worker)
-        graph_builder.add_node("tools", ToolNode(tools=self.tools))
+        graph_builder.add_node("tools", self.tools_node)
         graph_builder.add_node("evaluator", self.evaluator)
 
         # Add edges
@@ -187,12 +245,21 @@ class Sidekick:
         graph_builder.add_conditional_edges(
             "evaluator", self.route_based_on_evaluation, {"worker": "worker", "END": END}
         )
-        graph_builder.add_edge(START, "worker")
+        graph_builder.add_edge(START, "compactor")
+        graph_builder.add_edge("compactor", "worker")
 
         # Compile the graph
         self.graph = graph_builder.compile(checkpointer=self.memory)
 
     async def run_superstep(self, message, success_criteria, history):
+        update = history
+        async for update in self.stream_superstep(message, success_criteria, history):
+            pass
+        return update
+
+    async def stream_superstep(self, message, success_criteria, history):
+        """Run the graph, yielding the chat history with the worker's reply as its tokens arrive,
+        and finally with the reply and the evaluator's feedback"""
         config = {"configurable": {"thread_id": self.sidekick_id}}
 
         state = {
@@ -202,21 +269,42 @@ class Sidekick:
             "success_criteria_met": False,
             "user_input_needed": False,
         }
-        result = await self.graph.ainvoke(state, config=config)
         user = {"role": "user", "content": message}
+        reply_id, partial = None, ""
+        async for chunk, metadata in self.graph.astream(state, config=config, stream_mode="messages"):
+            if metadata.get("langgraph_node") != "worker" or not isinstance(chunk.content, str):
+                continue
+            # Each worker turn is a new message; only the latest is shown while it is written
+            if chunk.id != reply_id:
+                reply_id, partial = chunk.id, ""
+            partial += chunk.content
+            if partial:
+                yield history + [user, {"role": "assistant", "content": partial}]
+        result = (await self.graph.aget_state(config)).values
+        await self.memory.prune(self.sidekick_id)
         reply = {"role": "assistant", "content": result["messages"][-2].content}
         feedback = {"role": "assistant", "content": result["messages"][-1].content}
-        return history + [user, reply, feedback]
+        yield history + [user, reply, feedback]
+
+    async def history(self) -> List[Dict[str, str]]:
+        """The saved conversation, as chat messages, for showing a resumed session"""
+        snapshot = await self.graph.aget_state({"configurable": {"thread_id": self.sidekick_id}})
+        history = []
+        if snapshot.values.get("summary"):
+            summary = snapshot.values["summary"]
+            history.append({"role": "assistant", "content": f"Summary of the earlier conversation: {summary}"})
+        for message in snapshot.values.get("messages", []):
+            if isinstance(message, HumanMessage):
+                history.append({"role": "user", "content": message.content})
+            elif isinstance(message, AIMessage) and message.content and not message.tool_calls:
+                history.append({"role": "assistant", "content": message.content})
+        return history
 
     def cleanup(self):
         if self.browser:
             try:
                 loop = asyncio.get_running_loop()
                 loop.create_task(self.browser.close())
-                if self.playwright:
-                    loop.create_task(self.playwright.stop())
             except RuntimeError:
                 # If no loop is running, do a direct run
                 asyncio.run(self.browser.close())
-                if self.playwright:
-                    asyncio.run(self.playwright.stop())
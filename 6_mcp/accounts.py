@@ -1,14 +1,14 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 import json
 from dotenv import load_dotenv
-from datetime import datetime
-from market import get_share_price
+from market import get_share_price, get_share_prices, market_time
 from database import write_account, read_account, write_log
 
 load_dotenv(override=True)
 
 INITIAL_BALANCE = 10_000.0
 SPREAD = 0.002
+REPORT_RECENT_TRANSACTIONS = 20
 
 
 class Transaction(BaseModel):
@@ -31,11 +31,25 @@ class Account(BaseModel):
     strategy: str
     holdings: dict[str, int]
     transactions: list[Transaction]
+    # Only the points recorded since the account was loaded; query the full series with read_portfolio_values
     portfolio_value_time_series: list[tuple[str, float]]
+    # Running aggregates, updated on every trade so P&L never rescans the transactions
+    net_invested: float = 0.0
+    cost_basis: dict[str, float] = {}
+    realized_pnl: dict[str, float] = {}
+    # How much of each history list is already stored, so save() only appends the rest
+    _saved_transactions: int = PrivateAttr(default=0)
+    _saved_portfolio_values: int = PrivateAttr(default=0)
+    # The stored version this account was read at; save() fails with StaleAccountError if it has moved on
+    _version: int = PrivateAttr(default=0)
 
     @classmethod
-    def get(cls, name: str):
-        fields = read_account(name.lower())
+    def get(cls, name: str, recent_transactions: int | None = REPORT_RECENT_TRANSACTIONS):
+        """ Load the account with only its latest transactions, as reports show, unless recent_transactions is None. """
+        fields = read_account(name.lower(), recent_transactions)
+        if fields and fields.get("net_invested") is None and recent_transactions is not None:
+            # Rebuilding the aggregates of a migrated account takes its whole history
+            fields = read_account(name.lower())
         if not fields:
             fields = {
                 "name": name.lower(),
@@ -45,12 +59,36 @@ class Account(BaseModel):
                 "transactions": [],
                 "portfolio_value_time_series": []
             }
-            write_account(name, fields)
-        return cls(**fields)
-    
-    
-    def save(self):
-        write_account(self.name.lower(), self.model_dump())
+            fields["version"] = write_account(name, fields)
+        needs_aggregates = fields.get("net_invested") is None
+        version = fields.pop("version")
+        account = cls(**{key: value for key, value in fields.items() if value is not None})
+        account._version = version
+        account._mark_saved()
+        if needs_aggregates:
+            account.rebuild_aggregates()
+            account.save()
+        return account
+
+    def _mark_saved(self):
+        self._saved_transactions = len(self.transactions)
+        self._saved_portfolio_values = len(self.portfolio_value_time_series)
+
+    def save(self, reset_history: bool = False):
+        self._version = write_account(
+            self.name.lower(),
+            self.model_dump(include={"balance", "strategy", "holdings", "net_invested", "cost_basis", "realized_pnl"}),
+            [transaction.model_dump() for transaction in self.transactions[self._saved_transactions:]],
+            self.portfolio_value_time_series[self._saved_portfolio_values:],
+            expected_version=self._version,
+            reset_history=reset_history,
+        )
+        self._mark_saved()
+
+    def trim_saved_history(self):
+        """ Drop the portfolio values already stored, so a long-lived account doesn't grow with every report. """
+        del self.portfolio_value_time_series[:self._saved_portfolio_values]
+        self._saved_portfolio_values = 0
 
     def reset(self, strategy: str):
         self.balance = INITIAL_BALANCE
@@ -58,7 +96,36 @@ class Account(BaseModel):
         self.holdings = {}
         self.transactions = []
         self.portfolio_value_time_series = []
-        self.save()
+        self.net_invested = 0.0
+        self.cost_basis = {}
+        self.realized_pnl = {}
+        self._mark_saved()
+        # The stored history is deleted in the same transaction, so no reader sees a half-reset account
+        self.save(reset_history=True)
+
+    def _apply_to_aggregates(self, transaction: Transaction, held_before: int):
+        """ Fold one trade into the net invested cash, average cost basis and realized P&L. """
+        symbol = transaction.symbol
+        self.net_invested += transaction.total()
+        average_cost = self.cost_basis.get(symbol, 0.0)
+        if transaction.quantity > 0:
+            held_after = held_before + transaction.quantity
+            self.cost_basis[symbol] = (held_before * average_cost + transaction.total()) / held_after
+        else:
+            sold = -transaction.quantity
+            self.realized_pnl[symbol] = self.realized_pnl.get(symbol, 0.0) + sold * (transaction.price - average_cost)
+            if held_before - sold <= 0:
+                self.cost_basis.pop(symbol, None)
+
+    def rebuild_aggregates(self):
+        """ Recompute the running aggregates from the full transaction history. """
+        self.net_invested = 0.0
+        self.cost_basis = {}
+        self.realized_pnl = {}
+        held = {}
+        for transaction in self.transactions:
+            self._apply_to_aggregates(transaction, held.get(transaction.symbol, 0))
+            held[transaction.symbol] = held.get(transaction.symbol, 0) + transaction.quantity
 
     def deposit(self, amount: float):
         """ Deposit funds into the account. """
@@ -76,8 +143,8 @@ class Account(BaseModel):
         print(f"Withdrew ${amount}. New balance: ${self.balance}")
         self.save()
 
-    def buy_shares(self, symbol: str, quantity: int, rationale: str) -> str:
-        """ Buy shares of a stock if sufficient funds are available. """
+    def buy(self, symbol: str, quantity: int, rationale: str):
+        """ Buy shares of a stock if sufficient funds are available, saving the trade. """
         price = get_share_price(symbol)
         buy_price = price * (1 + SPREAD)
         total_cost = buy_price * quantity
@@ -87,21 +154,27 @@ class Account(BaseModel):
         elif price==0:
             raise ValueError(f"Unrecognized symbol {symbol}")
         
-        # Update holdings
-        self.holdings[symbol] = self.holdings.get(symbol, 0) + quantity
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = market_time().strftime("%Y-%m-%d %H:%M:%S")
         # Record transaction
         transaction = Transaction(symbol=symbol, quantity=quantity, price=buy_price, timestamp=timestamp, rationale=rationale)
         self.transactions.append(transaction)
+        self._apply_to_aggregates(transaction, self.holdings.get(symbol, 0))
+
+        # Update holdings
+        self.holdings[symbol] = self.holdings.get(symbol, 0) + quantity
         
         # Update balance
         self.balance -= total_cost
         self.save()
         write_log(self.name, "account", f"Bought {quantity} of {symbol}")
+
+    def buy_shares(self, symbol: str, quantity: int, rationale: str) -> str:
+        """ Buy shares of a stock if sufficient funds are available, and report the account. """
+        self.buy(symbol, quantity, rationale)
         return "Completed. Latest details:\n" + self.report()
 
-    def sell_shares(self, symbol: str, quantity: int, rationale: str) -> str:
-        """ Sell shares of a stock if the user has enough shares. """
+    def sell(self, symbol: str, quantity: int, rationale: str):
+        """ Sell shares of a stock if the user has enough shares, saving the trade. """
         if self.holdings.get(symbol, 0) < quantity:
             raise ValueError(f"Cannot sell {quantity} shares of {symbol}. Not enough shares held.")
         
@@ -109,34 +182,52 @@ class Account(BaseModel):
         sell_price = price * (1 - SPREAD)
         total_proceeds = sell_price * quantity
         
+        timestamp = market_time().strftime("%Y-%m-%d %H:%M:%S")
+        # Record transaction
+        transaction = Transaction(symbol=symbol, quantity=-quantity, price=sell_price, timestamp=timestamp, rationale=rationale)  # negative quantity for sell
+        self.transactions.append(transaction)
+        self._apply_to_aggregates(transaction, self.holdings[symbol])
+
         # Update holdings
         self.holdings[symbol] -= quantity
         
         # If shares are completely sold, remove from holdings
         if self.holdings[symbol] == 0:
             del self.holdings[symbol]
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Record transaction
-        transaction = Transaction(symbol=symbol, quantity=-quantity, price=sell_price, timestamp=timestamp, rationale=rationale)  # negative quantity for sell
-        self.transactions.append(transaction)
 
         # Update balance
         self.balance += total_proceeds
         self.save()
         write_log(self.name, "account", f"Sold {quantity} of {symbol}")
+
+    def sell_shares(self, symbol: str, quantity: int, rationale: str) -> str:
+        """ Sell shares of a stock if the user has enough shares, and report the account. """
+        self.sell(symbol, quantity, rationale)
         return "Completed. Latest details:\n" + self.report()
 
-    def calculate_portfolio_value(self):
+    def get_holding_prices(self) -> dict[str, float]:
+        """ Look up the current price of every holding. """
+        return get_share_prices(self.holdings)
+
+    def calculate_portfolio_value(self, prices: dict[str, float] | None = None):
         """ Calculate the total value of the user's portfolio. """
+        if prices is None:
+            prices = self.get_holding_prices()
         total_value = self.balance
         for symbol, quantity in self.holdings.items():
-            total_value += get_share_price(symbol) * quantity
+            total_value += prices[symbol] * quantity
         return total_value
 
     def calculate_profit_loss(self, portfolio_value: float):
         """ Calculate profit or loss from the initial spend. """
-        initial_spend = sum(transaction.total() for transaction in self.transactions)
-        return portfolio_value - initial_spend - self.balance
+        return portfolio_value - self.net_invested - self.balance
+
+    def calculate_unrealized_profit_loss(self, prices: dict[str, float]) -> dict[str, float]:
+        """ Calculate the paper profit or loss of each holding against its average cost. """
+        return {
+            symbol: (prices[symbol] - self.cost_basis.get(symbol, 0.0)) * quantity
+            for symbol, quantity in self.holdings.items()
+        }
 
     def get_holdings(self):
         """ Report the current holdings of the user. """
@@ -144,21 +235,24 @@ class Account(BaseModel):
 
     def get_profit_loss(self):
         """ Report the user's profit or loss at any point in time. """
-        return self.calculate_profit_loss()
+        return self.calculate_profit_loss(self.calculate_portfolio_value())
 
     def list_transactions(self):
-        """ List all transactions made by the user. """
+        """ List the transactions loaded with the account: the latest ones, or all if it was loaded with all. """
         return [transaction.model_dump() for transaction in self.transactions]
     
     def report(self) -> str:
         """ Return a json string representing the account.  """
-        portfolio_value = self.calculate_portfolio_value()
-        self.portfolio_value_time_series.append((datetime.now().strftime("%Y-%m-%d %H:%M:%S"), portfolio_value))
+        prices = self.get_holding_prices()
+        portfolio_value = self.calculate_portfolio_value(prices)
+        self.portfolio_value_time_series.append((market_time().strftime("%Y-%m-%d %H:%M:%S"), portfolio_value))
         self.save()
         pnl = self.calculate_profit_loss(portfolio_value)
-        data = self.model_dump()
+        data = self.model_dump(exclude={"transactions", "portfolio_value_time_series"})
+        data["recent_transactions"] = [t.model_dump() for t in self.transactions[-REPORT_RECENT_TRANSACTIONS:]]
         data["total_portfolio_value"] = portfolio_value
         data["total_profit_loss"] = pnl
+        data["unrealized_profit_loss"] = self.calculate_unrealized_profit_loss(prices)
         write_log(self.name, "account", f"Retrieved account details")
         return json.dumps(data)
     
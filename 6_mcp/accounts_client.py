@@ -1,39 +1,113 @@
+import asyncio
+import anyio
 import mcp
 from mcp.client.stdio import stdio_client
 from mcp import StdioServerParameters
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
 from agents import FunctionTool
+from mcp_params import accounts_mcp
 import json
 
-params = StdioServerParameters(command="uv", args=["run", "accounts_server.py"], env=None)
+params = StdioServerParameters(**accounts_mcp)
+
+# Failures of the connection to the server, as opposed to errors from the request itself
+TRANSPORT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream, ConnectionError, EOFError)
+
+
+def is_transport_error(error: Exception) -> bool:
+    if isinstance(error, McpError):
+        return error.error.code == CONNECTION_CLOSED
+    return isinstance(error, TRANSPORT_ERRORS)
+
+
+class AccountsClient:
+    """
+    Keeps one MCP session with the accounts server open and shares it between callers.
+    The session lives in its own task, since the stdio transport must be closed by the task that opened it;
+    concurrent requests are multiplexed over it by request id.
+    If the connection fails, the session is restarted; reads are then retried once, but tool calls never are,
+    since a trade may already have gone through.
+    """
+
+    def __init__(self, server_params: StdioServerParameters = params):
+        self.server_params = server_params
+        self._session = None
+        self._task = None
+        self._closing = None
+        self._lock = asyncio.Lock()
+        self._tools = None
+
+    async def _serve(self, ready: asyncio.Future, closing: asyncio.Event):
+        try:
+            async with stdio_client(self.server_params) as streams:
+                async with mcp.ClientSession(*streams) as session:
+                    await session.initialize()
+                    ready.set_result(session)
+                    await closing.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+
+    async def _get_session(self) -> mcp.ClientSession:
+        async with self._lock:
+            if self._task is None or self._task.done():
+                ready = asyncio.get_running_loop().create_future()
+                self._closing = asyncio.Event()
+                self._task = asyncio.create_task(self._serve(ready, self._closing))
+                self._session = await ready
+            return self._session
+
+    async def close(self):
+        async with self._lock:
+            if self._task:
+                self._closing.set()
+                await self._task
+            self._task = None
+            self._session = None
+
+    async def _request(self, call, idempotent: bool = False):
+        session = await self._get_session()
+        try:
+            return await call(session)
+        except Exception as e:
+            if not is_transport_error(e):
+                raise
+            print(f"Lost the accounts server connection ({e!r}); reconnecting")
+            if self._session is session:
+                await self.close()
+            if not idempotent:
+                raise
+            return await call(await self._get_session())
+
+    async def list_tools(self):
+        if self._tools is None:
+            result = await self._request(lambda session: session.list_tools(), idempotent=True)
+            self._tools = result.tools
+        return self._tools
+
+    async def call_tool(self, tool_name, tool_args):
+        return await self._request(lambda session: session.call_tool(tool_name, tool_args))
+
+    async def read_resource(self, uri: str) -> str:
+        result = await self._request(lambda session: session.read_resource(uri), idempotent=True)
+        return result.contents[0].text
+
+
+accounts_client = AccountsClient()
 
 
 async def list_accounts_tools():
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            tools_result = await session.list_tools()
-            return tools_result.tools
-        
+    return await accounts_client.list_tools()
+
 async def call_accounts_tool(tool_name, tool_args):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.call_tool(tool_name, tool_args)
-            return result
-            
+    return await accounts_client.call_tool(tool_name, tool_args)
+
 async def read_accounts_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://accounts_server/{name}")
-            return result.contents[0].text
-        
+    return await accounts_client.read_resource(f"accounts://accounts_server/{name}")
+
 async def read_strategy_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://strategy/{name}")
-            return result.contents[0].text
+    return await accounts_client.read_resource(f"accounts://strategy/{name}")
 
 async def get_accounts_tools_openai():
     openai_tools = []
@@ -44,7 +118,7 @@ async def get_accounts_tools_openai():
             description=tool.description,
             params_json_schema=schema,
             on_invoke_tool=lambda ctx, args, toolname=tool.name: call_accounts_tool(toolname, json.loads(args))
-                
+
         )
         openai_tools.append(openai_tool)
-    return openai_tools
\ No newline at end of file
+    return openai_tools
@@ -1,8 +1,45 @@
+import json
 from mcp.server.fastmcp import FastMCP
 from accounts import Account
+from database import StaleAccountError, read_account_version
+from analytics import get_analytics
 
 mcp = FastMCP("accounts_server")
 
+MAX_SAVE_ATTEMPTS = 5
+
+# Accounts are cached in memory and only reloaded when their stored version has moved on, which
+# costs one indexed lookup per read; every save is a compare-and-swap on that version, so a write
+# from another process is never served stale or silently overwritten.
+accounts: dict[str, Account] = {}
+
+
+def get_account(name: str) -> Account:
+    name = name.lower()
+    account = accounts.get(name)
+    if account is None or account._version != read_account_version(name):
+        account = accounts[name] = Account.get(name)
+    return account
+
+
+def update_account(name: str, operation):
+    """Apply an operation that saves the account once, reloading and retrying if another writer got there first.
+    The operation is re-run on a conflict, so it must not save more than once."""
+    for _ in range(MAX_SAVE_ATTEMPTS):
+        account = get_account(name)
+        try:
+            result = operation(account)
+            account.trim_saved_history()
+            return result
+        except StaleAccountError:
+            accounts.pop(name.lower(), None)
+        except Exception:
+            # The cached copy may hold changes that were never saved
+            accounts.pop(name.lower(), None)
+            raise
+    raise StaleAccountError(f"Could not update account {name} after {MAX_SAVE_ATTEMPTS} attempts")
+
+
 @mcp.tool()
 async def get_balance(name: str) -> float:
     """Get the cash balance of the given account name.
@@ -10,7 +47,7 @@ async def get_balance(name: str) -> float:
     Args:
         name: The name of the account holder
     """
-    return Account.get(name).balance
+    return get_account(name).balance
 
 @mcp.tool()
 async def get_holdings(name: str) -> dict[str, int]:
@@ -19,10 +56,10 @@ async def get_holdings(name: str) -> dict[str, int]:
     Args:
         name: The name of the account holder
     """
-    return Account.get(name).holdings
+    return get_account(name).holdings
 
 @mcp.tool()
-async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> float:
+async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> str:
     """Buy shares of a stock.
 
     Args:
@@ -31,11 +68,13 @@ async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> f
         quantity: The quantity of shares to buy
         rationale: The rationale for the purchase and fit with the account's strategy
     """
-    return Account.get(name).buy_shares(symbol, quantity, rationale)
+    update_account(name, lambda account: account.buy(symbol, quantity, rationale))
+    # Reported separately, so a conflict while saving the report can't repeat the trade
+    return "Completed. Latest details:\n" + update_account(name, lambda account: account.report())
 
 
 @mcp.tool()
-async def sell_shares(name: str, symbol: str, quantity: int, rationale: str) -> float:
+async def sell_shares(name: str, symbol: str, quantity: int, rationale: str) -> str:
     """Sell shares of a stock.
 
     Args:
@@ -44,7 +83,8 @@ async def sell_shares(name: str, symbol: str, quantity: int, rationale: str) ->
         quantity: The quantity of shares to sell
         rationale: The rationale for the sale and fit with the account's strategy
     """
-    return Account.get(name).sell_shares(symbol, quantity, rationale)
+    update_account(name, lambda account: account.sell(symbol, quantity, rationale))
+    return "Completed. Latest details:\n" + update_account(name, lambda account: account.report())
 
 @mcp.tool()
 async def change_strategy(name: str, strategy: str) -> str:
@@ -54,17 +94,19 @@ async def change_strategy(name: str, strategy: str) -> str:
         name: The name of the account holder
         strategy: The new strategy for the account
     """
-    return Account.get(name).change_strategy(strategy)
+    return update_account(name, lambda account: account.change_strategy(strategy))
 
 @mcp.resource("accounts://accounts_server/{name}")
 async def read_account_resource(name: str) -> str:
-    account = Account.get(name.lower())
-    return account.report()
+    return update_account(name, lambda account: account.report())
 
 @mcp.resource("accounts://strategy/{name}")
 async def read_strategy_resource(name: str) -> str:
-    account = Account.get(name.lower())
-    return account.get_strategy()
+    return get_account(name).get_strategy()
+
+@mcp.resource("accounts://analytics/{name}")
+async def read_analytics_resource(name: str) -> str:
+    return json.dumps(get_analytics([name]).get(name.lower(), {}))
 
 if __name__ == "__main__":
-    mcp.run(transport='stdio')
\ No newline at end of file
+    mcp.run(transport='stdio')
@@ -0,0 +1,108 @@
+import threading
+import warnings
+import numpy as np
+from database import read_account, read_account_version, read_portfolio_values, read_traded_value
+from market import get_share_prices
+
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+
+# Analytics per account, keyed by the account version they were computed from
+_cache: dict[str, tuple[int, dict]] = {}
+_lock = threading.Lock()
+
+
+def _pad(rows: list[np.ndarray]) -> np.ndarray:
+    """Stack series of different lengths into one matrix, padding the short ones with NaN"""
+    width = max((len(row) for row in rows), default=0)
+    matrix = np.full((len(rows), width), np.nan)
+    for i, row in enumerate(rows):
+        matrix[i, : len(row)] = row
+    return matrix
+
+
+def _by_row(reduce, matrix: np.ndarray) -> np.ndarray:
+    """A NaN-ignoring reduction of each row, with NaN for rows that have no values, which NumPy rejects"""
+    result = np.full(len(matrix), np.nan)
+    filled = ~np.isnan(matrix).all(axis=1)
+    if filled.any():
+        result[filled] = reduce(matrix[filled], axis=1)
+    return result
+
+
+def _number(value) -> float | None:
+    return float(value) if np.isfinite(value) else None
+
+
+def compute_analytics(accounts: dict[str, dict], histories: dict[str, list[tuple[str, float]]]) -> dict[str, dict]:
+    """
+    Returns, drawdown, Sharpe and Sortino ratios, turnover and exposure for many accounts in one pass.
+    Each account's portfolio value series is a row of one matrix, so every statistic is a single
+    NumPy reduction across all of them. Ratios are annualized using each series' median sampling interval.
+    """
+    names = list(accounts)
+    values = _pad([np.array([value for _, value in histories[name]], dtype=float) for name in names])
+    times = _pad(
+        [np.array([when for when, _ in histories[name]], dtype="datetime64[s]").astype(float) for name in names]
+    )
+    counts = np.array([len(histories[name]) for name in names])
+    rows = np.arange(len(names))
+
+    with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+        # Rows too short for a statistic come out as NaN, reported as None
+        warnings.simplefilter("ignore", RuntimeWarning)
+        first = values[:, 0] if values.shape[1] else np.full(len(names), np.nan)
+        last = values[rows, np.maximum(counts - 1, 0)] if values.shape[1] else first
+        returns = values[:, 1:] / values[:, :-1] - 1
+        periods_per_year = SECONDS_PER_YEAR / _by_row(np.nanmedian, np.diff(times, axis=1))
+        mean = _by_row(np.nanmean, returns)
+        volatility = _by_row(lambda matrix, axis: np.nanstd(matrix, axis=axis, ddof=1), returns)
+        downside = np.sqrt(_by_row(np.nanmean, np.minimum(returns, 0.0) ** 2))
+        drawdowns = 1 - values / np.fmax.accumulate(values, axis=1)
+        max_drawdown = _by_row(np.nanmax, drawdowns)
+        average_value = _by_row(np.nanmean, values)
+
+        traded = np.array([accounts[name]["traded_value"] for name in names], dtype=float)
+
+        symbols = sorted({symbol for name in names for symbol in accounts[name]["holdings"]})
+        prices = get_share_prices(symbols)
+        holdings = np.array(
+            [[accounts[name]["holdings"].get(symbol, 0) for symbol in symbols] for name in names], dtype=float
+        ).reshape(len(names), len(symbols))
+        market_values = holdings * np.array([prices[symbol] for symbol in symbols], dtype=float)
+        balances = np.array([accounts[name]["balance"] for name in names], dtype=float)
+        totals = balances + market_values.sum(axis=1)
+        exposure = market_values / totals[:, None]
+
+        results = {}
+        for i, name in enumerate(names):
+            results[name] = {
+                "points": int(counts[i]),
+                "total_return": _number(last[i] / first[i] - 1),
+                "volatility": _number(volatility[i] * np.sqrt(periods_per_year[i])),
+                "sharpe": _number(mean[i] / volatility[i] * np.sqrt(periods_per_year[i])),
+                "sortino": _number(mean[i] / downside[i] * np.sqrt(periods_per_year[i])),
+                "max_drawdown": _number(max_drawdown[i]),
+                "current_drawdown": _number(drawdowns[i, counts[i] - 1]) if counts[i] else None,
+                "turnover": _number(traded[i] / average_value[i]),
+                "invested": _number(1 - balances[i] / totals[i]),
+                "exposure": {
+                    symbol: _number(exposure[i, j]) for j, symbol in enumerate(symbols) if holdings[i, j]
+                },
+            }
+    return results
+
+
+def get_analytics(names: list[str]) -> dict[str, dict]:
+    """Analytics for each account, recomputed together for just the accounts whose version has changed"""
+    names = [name.lower() for name in names]
+    with _lock:
+        stale = [name for name in names if name not in _cache or _cache[name][0] != read_account_version(name)]
+        # The transactions themselves aren't needed, only their total value for the turnover
+        accounts = {name: account for name in stale if (account := read_account(name, recent_transactions=0))}
+        if accounts:
+            histories = {name: read_portfolio_values(name) for name in accounts}
+            for name, account in accounts.items():
+                account["traded_value"] = read_traded_value(name)
+            for name, result in compute_analytics(accounts, histories).items():
+                _cache[name] = (accounts[name]["version"], result)
+        return {name: _cache[name][1] for name in names if name in _cache}
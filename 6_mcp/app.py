@@ -1,10 +1,21 @@
 import gradio as gr
 from util import css, js, Color
 import pandas as pd
+import threading
+import time
+from collections import deque
 from trading_floor import names, lastnames, short_model_names
 import plotly.express as px
 from accounts import Account
-from database import read_log
+from database import read_log_since, read_account_version, read_portfolio_values
+from analytics import get_analytics
+
+LOG_LINES = 13
+# Every open tab ticks these timers, but each trader hits the database at most once per interval
+LOG_POLL_SECONDS = 0.5
+ACCOUNT_POLL_SECONDS = 5
+# Roughly the chart's width in pixels; longer histories are downsampled to this many points
+CHART_POINTS = 400
 
 mapper = {
     "trace": Color.WHITE,
@@ -22,10 +33,40 @@ class Trader:
         self.lastname = lastname
         self.model_name = model_name
         self.account = Account.get(name)
+        self.version = read_account_version(name)
+        self.logs = deque(maxlen=LOG_LINES)
+        self.log_cursor = 0
+        self.last_log_poll = 0.0
+        self.last_account_poll = 0.0
+        self.lock = threading.Lock()
+        self.poll_logs()
 
     def reload(self):
         self.account = Account.get(self.name)
 
+    def poll_account(self) -> int:
+        """Reload the account if its stored version moved on, and return the current version"""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.last_account_poll >= ACCOUNT_POLL_SECONDS:
+                self.last_account_poll = now
+                version = read_account_version(self.name)
+                if version != self.version:
+                    self.reload()
+                    self.version = version
+            return self.version
+
+    def poll_logs(self) -> int:
+        """Fetch only the log rows after the last one seen, and return the id of the latest"""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.last_log_poll >= LOG_POLL_SECONDS:
+                self.last_log_poll = now
+                for id, timestamp, type, message in read_log_since(self.name, self.log_cursor, LOG_LINES):
+                    self.logs.append((timestamp, type, message))
+                    self.log_cursor = id
+            return self.log_cursor
+
     def get_title(self) -> str:
         return f"<div style='text-align: center;font-size:34px;'>{self.name}<span style='color:#ccc;font-size:24px;'> ({self.model_name}) - {self.lastname}</span></div>"
 
@@ -33,7 +74,8 @@ class Trader:
         return self.account.get_strategy()
 
     def get_portfolio_value_df(self) -> pd.DataFrame:
-        df = pd.DataFrame(self.account.portfolio_value_time_series, columns=["datetime", "value"])
+        points = read_portfolio_values(self.name, max_points=CHART_POINTS)
+        df = pd.DataFrame(points, columns=["datetime", "value"])
         df["datetime"] = pd.to_datetime(df["datetime"])
         return df
 
@@ -53,14 +95,46 @@ class Trader:
         fig.update_yaxes(tickfont=dict(size=8), tickformat=",.0f")
         return fig
 
+    def get_analytics(self) -> dict:
+        # Computed for every trader at once and cached by account version, so the other views hit the cache
+        return get_analytics(names).get(self.name.lower(), {})
+
+    def get_analytics_html(self) -> str:
+        analytics = self.get_analytics()
+
+        def percent(key):
+            value = analytics.get(key)
+            return "-" if value is None else f"{value:.1%}"
+
+        def ratio(key):
+            value = analytics.get(key)
+            return "-" if value is None else f"{value:.2f}"
+
+        stats = [
+            ("Return", percent("total_return")),
+            ("Max DD", percent("max_drawdown")),
+            ("Sharpe", ratio("sharpe")),
+            ("Sortino", ratio("sortino")),
+            ("Turnover", ratio("turnover")),
+            ("Invested", percent("invested")),
+        ]
+        cells = "".join(
+            f"<span style='margin:0 8px'><span style='color:#999'>{label}</span> {value}</span>" for label, value in stats
+        )
+        return f"<div style='text-align: center;font-size:14px;'>{cells}</div>"
+
     def get_holdings_df(self) -> pd.DataFrame:
         """Convert holdings to DataFrame for display"""
         holdings = self.account.get_holdings()
         if not holdings:
-            return pd.DataFrame(columns=["Symbol", "Quantity"])
+            return pd.DataFrame(columns=["Symbol", "Quantity", "Exposure"])
 
+        exposure = self.get_analytics().get("exposure", {})
         df = pd.DataFrame(
-            [{"Symbol": symbol, "Quantity": quantity} for symbol, quantity in holdings.items()]
+            [
+                {"Symbol": symbol, "Quantity": quantity, "Exposure": f"{exposure.get(symbol) or 0.0:.1%}"}
+                for symbol, quantity in holdings.items()
+            ]
         )
         return df
 
@@ -80,23 +154,20 @@ class Trader:
         emoji = "⬆" if pnl >= 0 else "⬇"
         return f"<div style='text-align: center;background-color:{color};'><span style='font-size:32px'>${portfolio_value:,.0f}</span><span style='font-size:24px'>&nbsp;&nbsp;&nbsp;{emoji}&nbsp;${pnl:,.0f}</span></div>"
 
-    def get_logs(self, previous=None) -> str:
-        logs = read_log(self.name, last_n=13)
+    def get_logs(self) -> str:
         response = ""
-        for log in logs:
+        for log in list(self.logs):
             timestamp, type, message = log
             color = mapper.get(type, Color.WHITE).value
             response += f"<span style='color:{color}'>{timestamp} : [{type}] {message}</span><br/>"
-        response = f"<div style='height:250px; overflow-y:auto;'>{response}</div>"
-        if response != previous:
-            return response
-        return gr.update()
+        return f"<div style='height:250px; overflow-y:auto;'>{response}</div>"
 
 
 class TraderView:
     def __init__(self, trader: Trader):
         self.trader = trader
         self.portfolio_value = None
+        self.analytics = None
         self.chart = None
         self.holdings_table = None
         self.transactions_table = None
@@ -106,6 +177,8 @@ class TraderView:
             gr.HTML(self.trader.get_title())
             with gr.Row():
                 self.portfolio_value = gr.HTML(self.trader.get_portfolio_value)
+            with gr.Row():
+                self.analytics = gr.HTML(self.trader.get_analytics_html)
             with gr.Row():
                 self.chart = gr.Plot(
                     self.trader.get_portfolio_value_chart, container=True, show_label=False
@@ -116,9 +189,9 @@ class TraderView:
                 self.holdings_table = gr.Dataframe(
                     value=self.trader.get_holdings_df,
                     label="Holdings",
-                    headers=["Symbol", "Quantity"],
+                    headers=["Symbol", "Quantity", "Exposure"],
                     row_count=(5, "dynamic"),
-                    col_count=2,
+                    col_count=3,
                     max_height=300,
                     elem_classes=["dataframe-fix-small"],
                 )
@@ -133,12 +206,18 @@ class TraderView:
                     elem_classes=["dataframe-fix"],
                 )
 
-        timer = gr.Timer(value=120)
+        # What this browser tab is currently showing, so it only re-renders on a change
+        shown_version = gr.State(lambda: self.trader.version)
+        shown_log_cursor = gr.State(lambda: self.trader.log_cursor)
+
+        timer = gr.Timer(value=ACCOUNT_POLL_SECONDS)
         timer.tick(
             fn=self.refresh,
-            inputs=[],
+            inputs=[shown_version],
             outputs=[
+                shown_version,
                 self.portfolio_value,
+                self.analytics,
                 self.chart,
                 self.holdings_table,
                 self.transactions_table,
@@ -146,24 +225,34 @@ class TraderView:
             show_progress="hidden",
             queue=False,
         )
-        log_timer = gr.Timer(value=0.5)
+        log_timer = gr.Timer(value=LOG_POLL_SECONDS)
         log_timer.tick(
-            fn=self.trader.get_logs,
-            inputs=[self.log],
-            outputs=[self.log],
+            fn=self.refresh_logs,
+            inputs=[shown_log_cursor],
+            outputs=[shown_log_cursor, self.log],
             show_progress="hidden",
             queue=False,
         )
 
-    def refresh(self):
-        self.trader.reload()
+    def refresh(self, shown_version):
+        version = self.trader.poll_account()
+        if version == shown_version:
+            return (shown_version,) + (gr.update(),) * 5
         return (
+            version,
             self.trader.get_portfolio_value(),
+            self.trader.get_analytics_html(),
             self.trader.get_portfolio_value_chart(),
             self.trader.get_holdings_df(),
             self.trader.get_transactions_df(),
         )
 
+    def refresh_logs(self, shown_log_cursor):
+        log_cursor = self.trader.poll_logs()
+        if log_cursor == shown_log_cursor:
+            return shown_log_cursor, gr.update()
+        return log_cursor, self.trader.get_logs()
+
 
 # Main UI construction
 def create_ui():
@@ -0,0 +1,269 @@
+"""
+Replay the trading floor over historical prices on a simulated clock.
+
+Prices come from a local OHLC file, CSV or Parquet, with date, symbol, open, high, low and close columns.
+It is converted once into .npy arrays in a folder beside it, which later runs memory-map.
+During a run market.get_share_price resolves against the simulated time, so Account trades and reports
+just as it does live, but into its own database (BACKTEST_DB) so accounts.db is untouched.
+The simulated time is also stored in that database, and the accounts and market MCP servers are started
+with BACKTEST_PRICES set, so they price and timestamp trades on the same clock.
+
+By default the traders are scripted stand-ins for the LLM: deterministic functions from the price history
+to orders, so the engine itself can be benchmarked and tested offline. A script may also be async.
+With --llm the real Traders run at every step instead, with the strategies from reset.py. Their research
+tool is off unless --research is given, since web search would show them what happened after the simulated date.
+
+Run with: uv run backtest.py prices.csv --start 2024-01-01 --end 2024-12-31
+Or:       uv run backtest.py prices.csv --start 2024-06-01 --end 2024-06-30 --llm --model gpt-4o-mini
+"""
+
+import os
+
+os.environ["ACCOUNTS_DB"] = os.path.abspath(os.getenv("BACKTEST_DB", "backtest.db"))
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import inspect  # noqa: E402
+import time  # noqa: E402
+from datetime import datetime  # noqa: E402
+import numpy as np  # noqa: E402
+from accounts import Account, SPREAD, INITIAL_BALANCE  # noqa: E402
+from database import write_simulated_time  # noqa: E402
+from market import set_simulation  # noqa: E402
+from ohlc import OHLCStore  # noqa: E402
+from reset import waren_strategy, george_strategy, ray_strategy, cathie_strategy  # noqa: E402
+
+class Simulation:
+    """The simulated clock and the prices visible at it; market.py defers to it while installed"""
+
+    def __init__(self, store: OHLCStore):
+        self.store = store
+        self.current: datetime | None = None
+
+    def advance(self, when: datetime) -> None:
+        self.current = when
+        # For the MCP servers, which run in their own processes
+        write_simulated_time(when)
+
+    def now(self) -> datetime:
+        return self.current
+
+    def get_share_prices(self, symbols: list[str]) -> dict[str, float]:
+        return self.store.prices(symbols, self.current)
+
+    def history(self, symbol: str, length: int) -> np.ndarray:
+        return self.store.history(symbol, self.current, length)
+
+
+class ScriptedTrader:
+    """
+    A deterministic stand-in for the LLM trader.
+    script(account, simulation) returns the orders for this step as {symbol: quantity}, negative to sell.
+    Sells run before buys so their proceeds can fund the buys; orders the account rejects are counted and skipped.
+    """
+
+    def __init__(self, name: str, script, strategy: str = ""):
+        self.name = name
+        self.script = script
+        self.strategy = strategy
+        self.account: Account | None = None
+        self.rejected = 0
+
+    def reset(self) -> None:
+        self.account = Account.get(self.name)
+        self.account.reset(self.strategy)
+        self.rejected = 0
+
+    async def run(self, simulation: Simulation) -> None:
+        orders = self.script(self.account, simulation)
+        if inspect.isawaitable(orders):
+            orders = await orders
+        for symbol, quantity in sorted(orders.items(), key=lambda order: order[1]):
+            try:
+                # Not buy_shares and sell_shares, whose report would record a portfolio value per trade besides mark()'s
+                if quantity < 0:
+                    self.account.sell(symbol, -quantity, "Scripted backtest order")
+                elif quantity > 0:
+                    self.account.buy(symbol, quantity, "Scripted backtest order")
+            except ValueError:
+                self.rejected += 1
+
+    def mark(self, simulation: Simulation) -> float:
+        """Record the portfolio value at the end of the step"""
+        value = self.account.calculate_portfolio_value()
+        timestamp = simulation.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.account.portfolio_value_time_series.append((timestamp, value))
+        self.account.save()
+        return value
+
+
+class LLMTrader(ScriptedTrader):
+    """
+    Runs the real Trader at each step. It trades through the accounts and market MCP servers,
+    which follow the simulated clock, and the account is reloaded afterwards to see its trades.
+    """
+
+    def __init__(self, name: str, strategy: str, model_name: str, mcp_pool, research: bool = False):
+        super().__init__(name, None, strategy)
+        from traders import Trader
+
+        self.trader = Trader(name, model_name=model_name)
+        self.trader.research = research
+        self.mcp_pool = mcp_pool
+
+    async def run(self, simulation: Simulation) -> None:
+        await self.trader.run(self.mcp_pool)
+        # With every transaction, as the results count the trades
+        self.account = Account.get(self.name, recent_transactions=None)
+
+
+def affordable(cash: float, price: float) -> int:
+    return int(cash // (price * (1 + SPREAD))) if price > 0 else 0
+
+
+def buy_and_hold(symbols: list[str]):
+    """Spend the cash equally across the symbols on the first step, then hold"""
+
+    def script(account: Account, simulation: Simulation) -> dict[str, int]:
+        if account.holdings:
+            return {}
+        prices = simulation.get_share_prices(symbols)
+        listed = [symbol for symbol in symbols if prices[symbol] > 0]
+        return {symbol: affordable(account.balance / len(listed), prices[symbol]) for symbol in listed}
+
+    return script
+
+
+def momentum(symbols: list[str], lookback: int = 20, top: int = 2):
+    """Hold the top symbols by return over the lookback window, provided that return is positive"""
+
+    def script(account: Account, simulation: Simulation) -> dict[str, int]:
+        scores = {}
+        for symbol in symbols:
+            closes = simulation.history(symbol, lookback + 1)
+            if len(closes) > lookback and closes[0] > 0:
+                scores[symbol] = closes[-1] / closes[0] - 1
+        winners = [symbol for symbol in sorted(scores, key=scores.get, reverse=True)[:top] if scores[symbol] > 0]
+        prices = simulation.get_share_prices(list(account.holdings) + winners)
+        orders = {symbol: -quantity for symbol, quantity in account.holdings.items() if symbol not in winners}
+        cash = account.balance + sum(prices[symbol] * (1 - SPREAD) * -quantity for symbol, quantity in orders.items())
+        buying = [symbol for symbol in winners if symbol not in account.holdings]
+        for symbol in buying:
+            orders[symbol] = affordable(cash / len(buying), prices[symbol])
+        return orders
+
+    return script
+
+
+STRATEGIES = {"Warren": waren_strategy, "George": george_strategy, "Ray": ray_strategy, "Cathie": cathie_strategy}
+
+
+def create_llm_traders(model_name: str, mcp_pool, research: bool = False) -> list[LLMTrader]:
+    return [LLMTrader(name, strategy, model_name, mcp_pool, research) for name, strategy in STRATEGIES.items()]
+
+
+def create_scripted_traders(symbols: list[str]) -> list[ScriptedTrader]:
+    return [
+        ScriptedTrader("Warren", buy_and_hold(symbols), waren_strategy),
+        ScriptedTrader("George", momentum(symbols, lookback=5, top=1), george_strategy),
+        ScriptedTrader("Ray", momentum(symbols, lookback=60, top=max(1, len(symbols) // 2)), ray_strategy),
+        ScriptedTrader("Cathie", momentum(symbols, lookback=20, top=2), cathie_strategy),
+    ]
+
+
+def max_drawdown(values: np.ndarray) -> float:
+    if len(values) == 0:
+        return 0.0
+    peaks = np.maximum.accumulate(values)
+    return float(np.max((peaks - values) / peaks))
+
+
+class Backtest:
+    """Step the simulated clock through every bar in the range, running all the traders at each one"""
+
+    def __init__(
+        self, store: OHLCStore, traders: list[ScriptedTrader], start: datetime, end: datetime, mcp_pool=None
+    ):
+        self.store = store
+        self.traders = traders
+        self.start = start
+        self.end = end
+        # For LLM traders, whose servers are started before each step as the trading floor does
+        self.mcp_pool = mcp_pool
+        self.steps = 0
+        self.elapsed = 0.0
+
+    async def run(self) -> dict[str, dict]:
+        simulation = Simulation(self.store)
+        values = {trader.name: [] for trader in self.traders}
+        set_simulation(simulation)
+        try:
+            for trader in self.traders:
+                trader.reset()
+            start = time.perf_counter()
+            for when in self.store.dates_between(self.start, self.end):
+                simulation.advance(when)
+                if self.mcp_pool:
+                    await self.mcp_pool.prepare([trader.trader.mcp_server_params() for trader in self.traders])
+                await asyncio.gather(*[trader.run(simulation) for trader in self.traders])
+                for trader in self.traders:
+                    values[trader.name].append(trader.mark(simulation))
+                self.steps += 1
+            self.elapsed = time.perf_counter() - start
+        finally:
+            set_simulation(None)
+        return {
+            trader.name: {
+                "final_value": values[trader.name][-1] if values[trader.name] else INITIAL_BALANCE,
+                "return": (values[trader.name][-1] / INITIAL_BALANCE - 1) if values[trader.name] else 0.0,
+                "max_drawdown": max_drawdown(np.array(values[trader.name])),
+                "trades": len(trader.account.transactions),
+                "rejected": trader.rejected,
+            }
+            for trader in self.traders
+        }
+
+
+async def run_llm_backtest(store: OHLCStore, args) -> tuple[Backtest, dict[str, dict]]:
+    # Read by mcp_params when the traders are imported, so the servers they start follow the simulated clock
+    os.environ["BACKTEST_PRICES"] = os.path.abspath(args.prices)
+    from accounts_client import accounts_client
+    from mcp_pool import MCPServerPool
+
+    mcp_pool = MCPServerPool()
+    try:
+        traders = create_llm_traders(args.model, mcp_pool, args.research)
+        backtest = Backtest(store, traders, args.start, args.end, mcp_pool)
+        return backtest, await backtest.run()
+    finally:
+        await mcp_pool.close()
+        await accounts_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the traders over historical prices")
+    parser.add_argument("prices", help="CSV or Parquet file with date, symbol, open, high, low, close columns")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=datetime.min)
+    parser.add_argument("--end", type=datetime.fromisoformat, default=datetime.max)
+    parser.add_argument("--symbols", nargs="*", help="Symbols the scripted traders may use; defaults to all of them")
+    parser.add_argument("--llm", action="store_true", help="Run the LLM traders with the reset.py strategies")
+    parser.add_argument("--model", default="gpt-4o-mini", help="The model for the LLM traders")
+    parser.add_argument("--research", action="store_true", help="Let the LLM traders research on the web")
+    args = parser.parse_args()
+
+    store = OHLCStore(args.prices)
+    if args.llm:
+        backtest, results = asyncio.run(run_llm_backtest(store, args))
+    else:
+        backtest = Backtest(store, create_scripted_traders(args.symbols or store.symbols), args.start, args.end)
+        results = asyncio.run(backtest.run())
+    print(f"{backtest.steps} steps in {backtest.elapsed:.2f}s ({backtest.steps / max(backtest.elapsed, 1e-9):,.0f} steps/sec)")
+    for name, result in results.items():
+        print(
+            f"{name:<8} ${result['final_value']:>12,.2f}  return {result['return']:>7.2%}  "
+            f"max drawdown {result['max_drawdown']:>6.2%}  {result['trades']} trades, {result['rejected']} rejected"
+        )
+
+
+if __name__ == "__main__":
+    main()
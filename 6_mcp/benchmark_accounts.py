@@ -0,0 +1,61 @@
+"""
+Time Account.save() after a single trade on an account that already has 100k transactions,
+comparing the old one-JSON-blob-per-account write with the normalized append-only tables.
+
+Run with: uv run benchmark_accounts.py
+It works in a temporary folder, so your accounts.db is untouched.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+os.chdir(tempfile.mkdtemp())
+
+from accounts import Account, Transaction  # noqa: E402
+from database import pool  # noqa: E402
+
+HISTORY = 100_000
+TRADES = 50
+
+
+def make_transaction(i: int) -> Transaction:
+    return Transaction(
+        symbol="AAPL", quantity=1, price=100.0 + i % 10, timestamp="2025-01-01 10:00:00", rationale="Benchmark"
+    )
+
+
+def save_as_blob(account: Account):
+    with pool.connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO accounts (name, account)
+            VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET account=excluded.account
+            """,
+            ("legacy", json.dumps(account.model_dump())),
+        )
+
+
+def measure(label: str, account: Account, save):
+    start = time.perf_counter()
+    for i in range(TRADES):
+        account.transactions.append(make_transaction(i))
+        account.holdings["AAPL"] = account.holdings.get("AAPL", 0) + 1
+        save(account)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<30} {elapsed / TRADES * 1000:>10.2f} ms per save")
+
+
+def main():
+    account = Account.get("bench")
+    account.transactions = [make_transaction(i) for i in range(HISTORY)]
+    account.save()
+    print(f"Account has {len(account.transactions):,} transactions")
+    measure("one JSON blob per account", account, save_as_blob)
+    measure("normalized, append-only", account, Account.save)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Compare the latency of reading an account's strategy through a fresh MCP connection per call
+(the old accounts_client behaviour) with the persistent AccountsClient session.
+
+Run with: uv run benchmark_accounts_client.py
+"""
+
+import asyncio
+import time
+import mcp
+from mcp.client.stdio import stdio_client
+from accounts_client import AccountsClient, params
+
+CALLS = 20
+NAME = "Warren"
+
+
+async def read_strategy_per_call(name: str) -> str:
+    async with stdio_client(params) as streams:
+        async with mcp.ClientSession(*streams) as session:
+            await session.initialize()
+            result = await session.read_resource(f"accounts://strategy/{name}")
+            return result.contents[0].text
+
+
+async def measure(label: str, read):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        await read(NAME)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<30} {elapsed / CALLS * 1000:>10.1f} ms per call")
+
+
+async def main():
+    await measure("new session per call", read_strategy_per_call)
+    client = AccountsClient()
+    await measure("persistent session", lambda name: client.read_resource(f"accounts://strategy/{name}"))
+    await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,59 @@
+"""
+Run the scripted traders through ten years of synthetic daily prices and report the steps per second.
+The random walk is seeded, so every run trades identically and the results can be compared.
+
+Run with: uv run benchmark_backtest.py
+It works in a temporary folder, so your accounts.db and backtest.db are untouched.
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+
+os.chdir(tempfile.mkdtemp())
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from backtest import Backtest, OHLCStore, create_scripted_traders  # noqa: E402
+
+SYMBOLS = 20
+DAYS = 2_520
+SEED = 42
+
+
+def write_prices(path: str) -> None:
+    rng = np.random.default_rng(SEED)
+    dates = pd.bdate_range("2015-01-01", periods=DAYS)
+    frames = []
+    for i in range(SYMBOLS):
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, DAYS)))
+        spread = close * rng.uniform(0, 0.01, DAYS)
+        frames.append(
+            pd.DataFrame(
+                {
+                    "date": dates,
+                    "symbol": f"SYM{i:02d}",
+                    "open": close + rng.uniform(-1, 1, DAYS) * spread,
+                    "high": close + spread,
+                    "low": close - spread,
+                    "close": close,
+                }
+            )
+        )
+    pd.concat(frames).to_csv(path, index=False)
+
+
+def main():
+    write_prices("prices.csv")
+    store = OHLCStore("prices.csv")
+    backtest = Backtest(store, create_scripted_traders(store.symbols), datetime.min, datetime.max)
+    results = asyncio.run(backtest.run())
+    print(f"{SYMBOLS} symbols, {len(results)} traders")
+    print(f"{backtest.steps} steps in {backtest.elapsed:.2f}s, {backtest.steps / backtest.elapsed:,.0f} steps/sec")
+    for name, result in results.items():
+        print(f"{name:<8} return {result['return']:>8.2%}  {result['trades']} trades")
+
+
+if __name__ == "__main__":
+    main()
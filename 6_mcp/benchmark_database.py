@@ -0,0 +1,74 @@
+"""
+Compare log writes per second for a fresh connection per call (the old behaviour)
+against the pooled WAL connections and the batched log sink in database.py.
+
+Run with: uv run benchmark_database.py
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from database import ConnectionPool, LogSink, INSERT_LOG, SQLITE_SYNCHRONOUS
+
+WRITES = 2_000
+THREADS = 4
+LOG_TABLE = """
+    CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        datetime DATETIME,
+        type TEXT,
+        message TEXT
+    )
+"""
+
+
+def write_log_unpooled(path: str, i: int):
+    with sqlite3.connect(path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(INSERT_LOG, ("bench", datetime.now().isoformat(), "span", f"Message {i}"))
+        conn.commit()
+
+
+def write_log_pooled(pool: ConnectionPool, i: int):
+    with pool.connection() as conn:
+        conn.execute(INSERT_LOG, ("bench", datetime.now().isoformat(), "span", f"Message {i}"))
+
+
+def write_log_queued(sink: LogSink, i: int):
+    sink.put(("bench", datetime.now().isoformat(), "span", f"Message {i}"))
+
+
+def measure(label: str, write, finish=None):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        list(executor.map(write, range(WRITES)))
+    if finish:
+        finish()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {WRITES / elapsed:>10,.0f} writes/sec")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        before = os.path.join(folder, "before.db")
+        with sqlite3.connect(before) as conn:
+            conn.execute(LOG_TABLE)
+        measure("connect per call (rollback journal)", lambda i: write_log_unpooled(before, i))
+
+        pool = ConnectionPool(os.path.join(folder, "after.db"))
+        with pool.connection() as conn:
+            conn.execute(LOG_TABLE)
+        measure(f"pooled WAL (synchronous={SQLITE_SYNCHRONOUS})", lambda i: write_log_pooled(pool, i))
+
+        sink = LogSink(pool)
+        measure("batched log sink, flushed at the end", lambda i: write_log_queued(sink, i), sink.shutdown)
+        print(f"Log sink wrote {sink.written} rows and dropped {sink.dropped}")
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
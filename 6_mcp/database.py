@@ -1,16 +1,342 @@
 import sqlite3
 import json
-from datetime import datetime
+import os
+import queue
+import threading
+import atexit
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
-DB = "accounts.db"
+DB = os.getenv("ACCOUNTS_DB", "accounts.db")
 
+# WAL lets the dashboard read while the traders write; NORMAL only fsyncs at checkpoints,
+# which is safe under WAL. Use FULL if you need every commit to survive a power cut.
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").strip().upper()
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+SQLITE_BUSY_TIMEOUT_SECONDS = 30
 
-with sqlite3.connect(DB) as conn:
+SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+# Log entries are queued in memory and written in batches by a background thread
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL_SECONDS = float(os.getenv("LOG_FLUSH_INTERVAL_SECONDS", "0.25"))
+
+# Statements are kept as constants so sqlite3's per-connection statement cache reuses them
+
+UPSERT_BALANCE = """
+    INSERT INTO balances (name, balance, strategy, net_invested, version)
+    VALUES (?, ?, ?, ?, 1)
+    ON CONFLICT(name) DO UPDATE SET
+        balance=excluded.balance, strategy=excluded.strategy, net_invested=excluded.net_invested,
+        version=version + 1
+    RETURNING version
+"""
+UPDATE_BALANCE_IF_VERSION = """
+    UPDATE balances SET balance = ?, strategy = ?, net_invested = ?, version = version + 1
+    WHERE name = ? AND version = ?
+    RETURNING version
+"""
+SELECT_BALANCE = "SELECT balance, strategy, net_invested, version FROM balances WHERE name = ?"
+SELECT_ACCOUNT_VERSION = "SELECT version FROM balances WHERE name = ?"
+DELETE_POSITIONS = "DELETE FROM positions WHERE name = ?"
+INSERT_POSITION = "INSERT INTO positions (name, symbol, average_cost, realized_pnl) VALUES (?, ?, ?, ?)"
+SELECT_POSITIONS = "SELECT symbol, average_cost, realized_pnl FROM positions WHERE name = ? ORDER BY rowid"
+DELETE_HOLDINGS = "DELETE FROM holdings WHERE name = ?"
+INSERT_HOLDING = "INSERT INTO holdings (name, symbol, quantity) VALUES (?, ?, ?)"
+SELECT_HOLDINGS = "SELECT symbol, quantity FROM holdings WHERE name = ? ORDER BY rowid"
+INSERT_TRANSACTION = """
+    INSERT INTO transactions (name, symbol, quantity, price, timestamp, rationale)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+SELECT_TRANSACTIONS = """
+    SELECT symbol, quantity, price, timestamp, rationale FROM (
+        SELECT id, symbol, quantity, price, timestamp, rationale FROM transactions
+        WHERE name = ?
+        ORDER BY id DESC LIMIT ?
+    ) ORDER BY id
+"""
+SELECT_TRADED_VALUE = "SELECT COALESCE(SUM(ABS(quantity * price)), 0.0) FROM transactions WHERE name = ?"
+DELETE_TRANSACTIONS = "DELETE FROM transactions WHERE name = ?"
+INSERT_PORTFOLIO_VALUE = "INSERT INTO portfolio_values (name, datetime, value) VALUES (?, ?, ?)"
+SELECT_PORTFOLIO_VALUE_SPAN = """
+    SELECT julianday(MIN(datetime)), julianday(MAX(datetime)) FROM portfolio_values
+    WHERE name = ? AND datetime >= ? AND datetime <= ?
+"""
+# Splits a time range into equal-width buckets and keeps the lowest and highest point of each,
+# relying on SQLite returning the row that holds the MIN() or MAX() for the bare columns
+SELECT_PORTFOLIO_VALUE_BUCKETS = """
+    WITH ranged AS (
+        SELECT id, datetime, value, CAST((julianday(datetime) - ?) * ? AS INTEGER) AS bucket
+        FROM portfolio_values
+        WHERE name = ? AND datetime >= ? AND datetime <= ?
+    ),
+    extremes AS (
+        SELECT id, datetime, MIN(value) AS value FROM ranged GROUP BY bucket
+        UNION
+        SELECT id, datetime, MAX(value) AS value FROM ranged GROUP BY bucket
+    )
+    SELECT datetime, value FROM extremes ORDER BY id
+"""
+SELECT_PORTFOLIO_VALUE_RANGE = """
+    SELECT datetime, value FROM portfolio_values
+    WHERE name = ? AND datetime >= ? AND datetime <= ?
+    ORDER BY id
+"""
+DELETE_PORTFOLIO_VALUES = "DELETE FROM portfolio_values WHERE name = ?"
+SELECT_LEGACY_ACCOUNTS = "SELECT name, account FROM accounts"
+DELETE_LEGACY_ACCOUNT = "DELETE FROM accounts WHERE name = ?"
+INSERT_LOG = """
+    INSERT INTO logs (name, datetime, type, message)
+    VALUES (?, ?, ?, ?)
+"""
+SELECT_LOG = """
+    SELECT datetime, type, message FROM logs
+    WHERE name = ?
+    ORDER BY datetime DESC, id DESC
+    LIMIT ?
+"""
+SELECT_LOG_SINCE = """
+    SELECT id, datetime, type, message FROM logs
+    WHERE name = ? AND id > ?
+    ORDER BY id DESC
+    LIMIT ?
+"""
+UPSERT_MARKET = """
+    INSERT INTO market (date, data)
+    VALUES (?, ?)
+    ON CONFLICT(date) DO UPDATE SET data=excluded.data
+"""
+SELECT_MARKET = "SELECT data FROM market WHERE date = ?"
+UPSERT_SIMULATED_TIME = "INSERT INTO simulation_clock (id, now) VALUES (1, ?) ON CONFLICT(id) DO UPDATE SET now=excluded.now"
+SELECT_SIMULATED_TIME = "SELECT now FROM simulation_clock WHERE id = 1"
+UPSERT_PRICE = """
+    INSERT INTO prices (symbol, price, fetched_at)
+    VALUES (?, ?, ?)
+    ON CONFLICT(symbol) DO UPDATE SET price=excluded.price, fetched_at=excluded.fetched_at
+"""
+SELECT_PRICES = "SELECT symbol, price, fetched_at FROM prices WHERE symbol IN (SELECT value FROM json_each(?))"
+
+
+class StaleAccountError(Exception):
+    """Raised when an account was saved by someone else since it was read"""
+
+
+class ConnectionPool:
+    """
+    A small thread-safe pool of long-lived SQLite connections in WAL mode.
+    Connections are created lazily up to `size`; callers block when all are in use.
+    """
+
+    def __init__(self, path: str, size: int = SQLITE_POOL_SIZE, synchronous: str = SQLITE_SYNCHRONOUS):
+        if synchronous not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"Unsupported synchronous level {synchronous}; use one of {sorted(SYNCHRONOUS_LEVELS)}")
+        self.path = path
+        self.size = max(1, size)
+        self.synchronous = synchronous
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=SQLITE_BUSY_TIMEOUT_SECONDS,
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if not can_create:
+            return self._idle.get()
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; the block runs in a transaction that commits on success."""
+        conn = self._acquire()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+class LogSink:
+    """
+    A bounded in-memory queue of log rows, drained with executemany by a background thread
+    every `interval` seconds or as soon as `batch_size` rows are waiting.
+    When the queue is full, new rows are dropped and counted rather than blocking the caller.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        max_size: int = LOG_QUEUE_SIZE,
+        batch_size: int = LOG_BATCH_SIZE,
+        interval: float = LOG_FLUSH_INTERVAL_SECONDS,
+    ):
+        self.pool = pool
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_size)
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_started(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+                self._thread.start()
+
+    def put(self, row: tuple) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def _take(self) -> list[tuple]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self) -> None:
+        """Write every queued row before returning"""
+        with self._write_lock:
+            while batch := self._take():
+                try:
+                    with self.pool.connection() as conn:
+                        conn.executemany(INSERT_LOG, batch)
+                    self.written += len(batch)
+                except sqlite3.Error as e:
+                    print(f"Dropping {len(batch)} log entries due to {e}")
+                    with self._lock:
+                        self.dropped += len(batch)
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+        self.flush()
+
+
+pool = ConnectionPool(DB)
+log_sink = LogSink(pool)
+atexit.register(log_sink.shutdown)
+
+
+with pool.connection() as conn:
     cursor = conn.cursor()
+    # Legacy table holding each account as one JSON blob; its rows are migrated on startup
     cursor.execute('CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS balances (
+            name TEXT PRIMARY KEY,
+            balance REAL,
+            strategy TEXT,
+            net_invested REAL,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    balance_columns = {column[1] for column in cursor.execute('PRAGMA table_info(balances)')}
+    if "net_invested" not in balance_columns:
+        cursor.execute('ALTER TABLE balances ADD COLUMN net_invested REAL')
+    if "version" not in balance_columns:
+        cursor.execute('ALTER TABLE balances ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+    # Running cost basis and realized P&L per symbol, kept after a position is closed
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS positions (
+            name TEXT,
+            symbol TEXT,
+            average_cost REAL,
+            realized_pnl REAL,
+            PRIMARY KEY (name, symbol)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS holdings (
+            name TEXT,
+            symbol TEXT,
+            quantity INTEGER,
+            PRIMARY KEY (name, symbol)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            symbol TEXT,
+            quantity INTEGER,
+            price REAL,
+            timestamp TEXT,
+            rationale TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_name ON transactions (name, id)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS portfolio_values (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            datetime TEXT,
+            value REAL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_portfolio_values_name ON portfolio_values (name, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_portfolio_values_time ON portfolio_values (name, datetime)')
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -20,82 +346,232 @@ with sqlite3.connect(DB) as conn:
             message TEXT
         )
     ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_name ON logs (name, id)')
     cursor.execute('CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)')
-    conn.commit()
-
-def write_account(name, account_dict):
-    json_data = json.dumps(account_dict)
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO accounts (name, account)
-            VALUES (?, ?)
-            ON CONFLICT(name) DO UPDATE SET account=excluded.account
-        ''', (name.lower(), json_data))
-        conn.commit()
-
-def read_account(name):
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT account FROM accounts WHERE name = ?', (name.lower(),))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
-    
+    # The current time of a backtest, for the MCP server processes it starts to follow
+    cursor.execute('CREATE TABLE IF NOT EXISTS simulation_clock (id INTEGER PRIMARY KEY CHECK (id = 1), now TEXT)')
+    # Latest price per symbol, shared by every process as the backing store of the price cache
+    cursor.execute('CREATE TABLE IF NOT EXISTS prices (symbol TEXT PRIMARY KEY, price REAL, fetched_at REAL)')
+
+def _write_account(
+    conn, name, account_dict, new_transactions, new_portfolio_values, expected_version=None, reset_history=False
+) -> int:
+    fields = (account_dict["balance"], account_dict["strategy"], account_dict.get("net_invested"))
+    if expected_version is None:
+        version = conn.execute(UPSERT_BALANCE, (name, *fields)).fetchone()[0]
+    else:
+        row = conn.execute(UPDATE_BALANCE_IF_VERSION, (*fields, name, expected_version)).fetchone()
+        if not row:
+            raise StaleAccountError(f"Account {name} has changed since version {expected_version}")
+        version = row[0]
+    conn.execute(DELETE_HOLDINGS, (name,))
+    conn.executemany(INSERT_HOLDING, [(name, symbol, quantity) for symbol, quantity in account_dict["holdings"].items()])
+    cost_basis = account_dict.get("cost_basis", {})
+    realized_pnl = account_dict.get("realized_pnl", {})
+    conn.execute(DELETE_POSITIONS, (name,))
+    conn.executemany(
+        INSERT_POSITION,
+        [(name, symbol, cost_basis.get(symbol), realized_pnl.get(symbol, 0.0)) for symbol in {**cost_basis, **realized_pnl}],
+    )
+    if reset_history:
+        conn.execute(DELETE_TRANSACTIONS, (name,))
+        conn.execute(DELETE_PORTFOLIO_VALUES, (name,))
+    conn.executemany(
+        INSERT_TRANSACTION,
+        [(name, t["symbol"], t["quantity"], t["price"], t["timestamp"], t["rationale"]) for t in new_transactions],
+    )
+    conn.executemany(INSERT_PORTFOLIO_VALUE, [(name, when, value) for when, value in new_portfolio_values])
+    return version
+
+def write_account(
+    name, account_dict, new_transactions=(), new_portfolio_values=(), expected_version=None, reset_history=False
+) -> int:
+    """
+    Save the balance, strategy and holdings of an account, and append its new history rows.
+    With an expected_version the save is a compare-and-swap: nothing is written and StaleAccountError
+    is raised if the stored account is no longer at that version.
+
+    Args:
+        name (str): The account name
+        account_dict (dict): The account fields; balance, strategy, holdings and the P&L aggregates are read
+        new_transactions (list): Transaction dicts recorded since the last save
+        new_portfolio_values (list): (datetime, value) points recorded since the last save
+        expected_version (int): The version the account was read at, or None to overwrite unconditionally
+        reset_history (bool): Delete the stored transactions and portfolio values first, in the same transaction
+
+    Returns:
+        int: The new version of the account
+    """
+    with pool.connection() as conn:
+        return _write_account(
+            conn, name.lower(), account_dict, new_transactions, new_portfolio_values, expected_version, reset_history
+        )
+
+def read_account(name, recent_transactions: int | None = None):
+    """
+    Read an account with its holdings and P&L aggregates as of one version, in a single read transaction.
+
+    Args:
+        name (str): The account name
+        recent_transactions (int): Load only this many of the latest transactions, or None for all of them
+
+    Returns:
+        dict: The account fields, or None if there is no such account
+    """
+    name = name.lower()
+    with pool.connection() as conn:
+        # One snapshot for all the SELECTs, so a save in between can't mix two versions
+        conn.execute("BEGIN")
+        row = conn.execute(SELECT_BALANCE, (name,)).fetchone()
+        if not row:
+            return None
+        balance, strategy, net_invested, version = row
+        holdings = dict(conn.execute(SELECT_HOLDINGS, (name,)).fetchall())
+        positions = conn.execute(SELECT_POSITIONS, (name,)).fetchall()
+        transactions = [
+            {"symbol": symbol, "quantity": quantity, "price": price, "timestamp": timestamp, "rationale": rationale}
+            for symbol, quantity, price, timestamp, rationale in conn.execute(
+                SELECT_TRANSACTIONS, (name, -1 if recent_transactions is None else recent_transactions)
+            )
+        ]
+    return {
+        "name": name,
+        "balance": balance,
+        "strategy": strategy,
+        "holdings": holdings,
+        "transactions": transactions,
+        # The series is not loaded with the account; use read_portfolio_values to query it
+        "portfolio_value_time_series": [],
+        "net_invested": net_invested,
+        "version": version,
+        "cost_basis": {symbol: average_cost for symbol, average_cost, _ in positions if average_cost is not None},
+        "realized_pnl": {symbol: realized_pnl for symbol, _, realized_pnl in positions},
+    }
+
+def read_portfolio_values(name, start: str = "", end: str = "9999", max_points: int | None = None):
+    """
+    Read an account's portfolio value points between two datetimes, optionally downsampled.
+
+    Args:
+        name (str): The account name
+        start (str): Earliest datetime to include, as "YYYY-MM-DD HH:MM:SS" or any prefix of it
+        end (str): Latest datetime to include
+        max_points (int): If given, keep at most this many points by min/max bucketing, which preserves peaks and troughs
+
+    Returns:
+        list: A list of (datetime, value) tuples in time order
+    """
+    with pool.connection() as conn:
+        if max_points is None:
+            rows = conn.execute(SELECT_PORTFOLIO_VALUE_RANGE, (name.lower(), start, end)).fetchall()
+        else:
+            first, last = conn.execute(SELECT_PORTFOLIO_VALUE_SPAN, (name.lower(), start, end)).fetchone()
+            if first is None:
+                return []
+            # The last point lands in a bucket of its own, hence one bucket fewer than the budget allows
+            buckets = max(1, max_points // 2 - 1)
+            scale = buckets / (last - first) if last > first else 0.0
+            rows = conn.execute(SELECT_PORTFOLIO_VALUE_BUCKETS, (first, scale, name.lower(), start, end)).fetchall()
+    return [tuple(row) for row in rows]
+
+def read_traded_value(name) -> float:
+    """Return the total value of every share bought or sold by the account"""
+    with pool.connection() as conn:
+        return conn.execute(SELECT_TRADED_VALUE, (name.lower(),)).fetchone()[0]
+
+def read_account_version(name) -> int | None:
+    """Return the stored version of the account, which changes on every save"""
+    with pool.connection() as conn:
+        row = conn.execute(SELECT_ACCOUNT_VERSION, (name.lower(),)).fetchone()
+        return row[0] if row else None
+
+def migrate_legacy_accounts() -> int:
+    """Move accounts stored as one JSON blob into the normalized tables, returning how many moved"""
+    with pool.connection() as conn:
+        rows = conn.execute(SELECT_LEGACY_ACCOUNTS).fetchall()
+        for name, account in rows:
+            account_dict = json.loads(account)
+            conn.execute(DELETE_TRANSACTIONS, (name,))
+            conn.execute(DELETE_PORTFOLIO_VALUES, (name,))
+            # Blob rows have no P&L aggregates; Account.get rebuilds them from the transactions
+            _write_account(
+                conn,
+                name,
+                account_dict,
+                account_dict.get("transactions", []),
+                account_dict.get("portfolio_value_time_series", []),
+            )
+            conn.execute(DELETE_LEGACY_ACCOUNT, (name,))
+    return len(rows)
+
+migrate_legacy_accounts()
+
 def write_log(name: str, type: str, message: str):
     """
-    Write a log entry to the logs table.
-    
+    Queue a log entry for the logs table; it is written by the background log sink.
+
     Args:
         name (str): The name associated with the log
         type (str): The type of log entry
         message (str): The log message
     """
-    now = datetime.now().isoformat()
-    
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO logs (name, datetime, type, message)
-            VALUES (?, datetime('now'), ?, ?)
-        ''', (name.lower(), type, message))
-        conn.commit()
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    log_sink.put((name.lower(), now, type, message))
 
 def read_log(name: str, last_n=10):
     """
     Read the most recent log entries for a given name.
-    
+
     Args:
         name (str): The name to retrieve logs for
         last_n (int): Number of most recent entries to retrieve
-        
+
     Returns:
         list: A list of tuples containing (datetime, type, message)
     """
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT datetime, type, message FROM logs 
-            WHERE name = ? 
-            ORDER BY datetime DESC
-            LIMIT ?
-        ''', (name.lower(), last_n))
-        
-        return reversed(cursor.fetchall())
+    with pool.connection() as conn:
+        return reversed(conn.execute(SELECT_LOG, (name.lower(), last_n)).fetchall())
+
+def read_log_since(name: str, after_id: int, last_n=10):
+    """
+    Read log entries added after a given log id, for tailing the log.
+
+    Args:
+        name (str): The name to retrieve logs for
+        after_id (int): Only entries with a greater id are returned
+        last_n (int): The most recent entries to return if there are more
+
+    Returns:
+        list: A list of tuples containing (id, datetime, type, message), oldest first
+    """
+    with pool.connection() as conn:
+        return list(reversed(conn.execute(SELECT_LOG_SINCE, (name.lower(), after_id, last_n)).fetchall()))
 
 def write_market(date: str, data: dict) -> None:
     data_json = json.dumps(data)
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO market (date, data)
-            VALUES (?, ?)
-            ON CONFLICT(date) DO UPDATE SET data=excluded.data
-        ''', (date, data_json))
-        conn.commit()
+    with pool.connection() as conn:
+        conn.execute(UPSERT_MARKET, (date, data_json))
 
 def read_market(date: str) -> dict | None:
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT data FROM market WHERE date = ?', (date,))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
\ No newline at end of file
+    with pool.connection() as conn:
+        row = conn.execute(SELECT_MARKET, (date,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+def write_simulated_time(now: datetime) -> None:
+    with pool.connection() as conn:
+        conn.execute(UPSERT_SIMULATED_TIME, (now.isoformat(),))
+
+def read_simulated_time() -> datetime | None:
+    with pool.connection() as conn:
+        row = conn.execute(SELECT_SIMULATED_TIME).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+def write_prices(prices: dict[str, float], fetched_at: float) -> None:
+    with pool.connection() as conn:
+        conn.executemany(UPSERT_PRICE, [(symbol, price, fetched_at) for symbol, price in prices.items()])
+
+def read_prices(symbols: list[str]) -> dict[str, tuple[float, float]]:
+    """Return the stored (price, fetched_at) of each symbol that has one"""
+    with pool.connection() as conn:
+        rows = conn.execute(SELECT_PRICES, (json.dumps(list(symbols)),)).fetchall()
+    return {symbol: (price, fetched_at) for symbol, price, fetched_at in rows}
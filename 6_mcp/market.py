@@ -1,9 +1,14 @@
 from polygon import RESTClient
 from dotenv import load_dotenv
+import atexit
 import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
 from datetime import datetime
 import random
-from database import write_market, read_market
+from database import write_market, read_market, write_prices, read_prices, read_simulated_time
 from functools import lru_cache
 from datetime import timezone
 
@@ -15,16 +20,67 @@ polygon_plan = os.getenv("POLYGON_PLAN")
 is_paid_polygon = polygon_plan == "paid"
 is_realtime_polygon = polygon_plan == "realtime"
 
+# How long a cached price is fresh for each kind of data, and how much longer it may be served
+# stale while a background refresh runs. PRICE_CACHE_TTL_SECONDS overrides the plan default.
+
+PRICE_CACHE_TTLS = {"eod": 3600.0, "minute": 60.0, "realtime": 5.0}
+price_cache_plan = "realtime" if is_realtime_polygon else "minute" if is_paid_polygon else "eod"
+PRICE_CACHE_TTL_SECONDS = float(os.getenv("PRICE_CACHE_TTL_SECONDS", PRICE_CACHE_TTLS[price_cache_plan]))
+PRICE_CACHE_STALE_SECONDS = float(os.getenv("PRICE_CACHE_STALE_SECONDS", PRICE_CACHE_TTL_SECONDS))
+# The cache lives in the MCP server processes, so it logs its hit and miss counts to their stderr this often
+PRICE_CACHE_REPORT_SECONDS = float(os.getenv("PRICE_CACHE_REPORT_SECONDS", "600"))
+
+# Set by backtest.py so prices and timestamps come from a simulated clock instead of the live market
+simulation = None
+# Given to the MCP servers a backtest starts: the OHLC file whose prices they serve at the backtest's time
+BACKTEST_PRICES = os.getenv("BACKTEST_PRICES")
+
+
+@lru_cache(maxsize=1)
+def get_client() -> RESTClient:
+    """One shared client, so its HTTP connection pool is reused across requests"""
+    return RESTClient(polygon_api_key)
+
+
+def set_simulation(sim) -> None:
+    global simulation
+    simulation = sim
+
+
+def market_time() -> datetime:
+    return simulation.now() if simulation else datetime.now()
+
+
+class SimulatedClock:
+    """A backtest's clock as seen from the server processes it starts: the time it last stored, and the prices then"""
+
+    def __init__(self, prices_path: str):
+        from ohlc import OHLCStore
+
+        self.store = OHLCStore(prices_path)
+
+    def now(self) -> datetime:
+        now = read_simulated_time()
+        if now is None:
+            raise RuntimeError("BACKTEST_PRICES is set but no backtest has stored its simulated time")
+        return now
+
+    def get_share_prices(self, symbols: list[str]) -> dict[str, float]:
+        return self.store.prices(symbols, self.now())
+
+
+if BACKTEST_PRICES:
+    set_simulation(SimulatedClock(BACKTEST_PRICES))
+
 
 def is_market_open() -> bool:
-    client = RESTClient(polygon_api_key)
-    market_status = client.get_market_status()
+    market_status = get_client().get_market_status()
     return market_status.market == "open"
 
 
 def get_all_share_prices_polygon_eod() -> dict[str, float]:
     """With much thanks to student Reema R. for fixing the timezone issue with this!"""
-    client = RESTClient(polygon_api_key)
+    client = get_client()
 
     probe = client.get_previous_close_agg("SPY")[0]
     last_close = datetime.fromtimestamp(probe.timestamp / 1000, tz=timezone.utc).date()
@@ -42,29 +98,164 @@ def get_market_for_prior_date(today):
     return market_data
 
 
-def get_share_price_polygon_eod(symbol) -> float:
+def get_share_prices_polygon_eod(symbols: list[str]) -> dict[str, float]:
     today = datetime.now().date().strftime("%Y-%m-%d")
     market_data = get_market_for_prior_date(today)
-    return market_data.get(symbol, 0.0)
+    return {symbol: market_data.get(symbol, 0.0) for symbol in symbols}
 
 
-def get_share_price_polygon_min(symbol) -> float:
-    client = RESTClient(polygon_api_key)
-    result = client.get_snapshot_ticker("stocks", symbol)
-    return result.min.close or result.prev_day.close
+def get_share_prices_polygon_min(symbols: list[str]) -> dict[str, float]:
+    """Fetch snapshots for all the symbols in a single request"""
+    snapshots = get_client().get_snapshot_all("stocks", tickers=symbols)
+    prices = {
+        snapshot.ticker: (snapshot.min and snapshot.min.close) or (snapshot.prev_day and snapshot.prev_day.close)
+        for snapshot in snapshots
+    }
+    return {symbol: prices.get(symbol) or 0.0 for symbol in symbols}
 
 
-def get_share_price_polygon(symbol) -> float:
-    if is_paid_polygon:
-        return get_share_price_polygon_min(symbol)
+def get_share_prices_polygon(symbols: list[str]) -> dict[str, float]:
+    if is_paid_polygon or is_realtime_polygon:
+        return get_share_prices_polygon_min(symbols)
     else:
-        return get_share_price_polygon_eod(symbol)
+        return get_share_prices_polygon_eod(symbols)
+
+
+class PriceCache:
+    """
+    A TTL cache of share prices with stale-while-revalidate, layered over the prices table
+    so that the market and accounts server processes share what either of them fetched.
+    Concurrent lookups of the same symbol wait on a single in-flight fetch.
+    Its hit and miss counts are logged to stderr every PRICE_CACHE_REPORT_SECONDS, as stdout carries the MCP protocol.
+    """
+
+    def __init__(self, fetch, ttl: float = PRICE_CACHE_TTL_SECONDS, stale: float = PRICE_CACHE_STALE_SECONDS):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale = stale
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._prices: dict[str, tuple[float, float]] = {}
+        self._in_flight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._last_report = time.time()
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses, "coalesced": self.coalesced}
+
+    def report(self) -> str:
+        lookups = self.hits + self.stale_hits + self.misses
+        served = (self.hits + self.stale_hits) / lookups if lookups else 0.0
+        counts = ", ".join(f"{count} {kind.replace('_', ' ')}" for kind, count in self.stats().items())
+        process = os.path.basename(sys.argv[0])
+        return f"Price cache in {process}: {counts}; {served:.0%} of {lookups} lookups served from cache"
+
+    def log_report(self) -> None:
+        if self.hits + self.stale_hits + self.misses:
+            print(self.report(), file=sys.stderr, flush=True)
+
+    def _maybe_report(self, now: float) -> None:
+        with self._lock:
+            if now - self._last_report < PRICE_CACHE_REPORT_SECONDS:
+                return
+            self._last_report = now
+        self.log_report()
+
+    def _load_shared(self, symbols: list[str]) -> None:
+        """Pick up prices that another process stored more recently than ours"""
+        for symbol, (price, fetched_at) in read_prices(symbols).items():
+            with self._lock:
+                if fetched_at > self._prices.get(symbol, (0.0, 0.0))[1]:
+                    self._prices[symbol] = (price, fetched_at)
+
+    def _age(self, symbol: str, now: float) -> float:
+        return now - self._prices[symbol][1] if symbol in self._prices else float("inf")
+
+    def _claim(self, symbols: list[str]) -> tuple[dict[str, Future], dict[str, Future]]:
+        """Split symbols into fetches this caller now owns and fetches already in flight"""
+        owned, waiting = {}, {}
+        with self._lock:
+            for symbol in symbols:
+                if symbol in self._in_flight:
+                    waiting[symbol] = self._in_flight[symbol]
+                else:
+                    owned[symbol] = self._in_flight[symbol] = Future()
+        return owned, waiting
+
+    def _refresh(self, owned: dict[str, Future]) -> None:
+        symbols = list(owned)
+        try:
+            prices = self.fetch(symbols)
+            fetched_at = time.time()
+            write_prices(prices, fetched_at)
+            with self._lock:
+                for symbol, price in prices.items():
+                    self._prices[symbol] = (price, fetched_at)
+            for symbol, future in owned.items():
+                future.set_result(prices.get(symbol, 0.0))
+        except Exception as e:
+            for future in owned.values():
+                future.set_exception(e)
+        finally:
+            with self._lock:
+                for symbol in symbols:
+                    self._in_flight.pop(symbol, None)
+
+    def get(self, symbols: list[str]) -> dict[str, float]:
+        now = time.time()
+        if any(self._age(symbol, now) >= self.ttl for symbol in symbols):
+            self._load_shared(symbols)
+        results, fresh, stale, missing = {}, [], [], []
+        for symbol in symbols:
+            age = self._age(symbol, now)
+            if age < self.ttl:
+                fresh.append(symbol)
+            elif age < self.ttl + self.stale:
+                stale.append(symbol)
+            else:
+                missing.append(symbol)
+        with self._lock:
+            self.hits += len(fresh)
+            self.stale_hits += len(stale)
+            self.misses += len(missing)
+            for symbol in fresh + stale:
+                results[symbol] = self._prices[symbol][0]
+        if stale:
+            owned, _ = self._claim(stale)
+            if owned:
+                threading.Thread(target=self._refresh, args=(owned,), daemon=True).start()
+        if missing:
+            owned, waiting = self._claim(missing)
+            with self._lock:
+                self.coalesced += len(waiting)
+            if owned:
+                self._refresh(owned)
+            for symbol, future in {**owned, **waiting}.items():
+                results[symbol] = future.result()
+        self._maybe_report(now)
+        return results
+
+
+price_cache = PriceCache(get_share_prices_polygon)
+atexit.register(price_cache.log_report)
 
 
 def get_share_price(symbol) -> float:
+    return get_share_prices([symbol])[symbol]
+
+
+def get_share_prices(symbols) -> dict[str, float]:
+    """Look up the prices of several symbols at once, returning a dict of symbol to price"""
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    if simulation:
+        return simulation.get_share_prices(symbols)
     if polygon_api_key:
         try:
-            return get_share_price_polygon(symbol)
+            return price_cache.get(symbols)
         except Exception as e:
-            print(f"Was not able to use the polygon API due to {e}; using a random number")
-    return float(random.randint(1, 100))
+            print(f"Was not able to use the polygon API due to {e}; using random numbers")
+    return {symbol: float(random.randint(1, 100)) for symbol in symbols}
@@ -7,25 +7,36 @@ load_dotenv(override=True)
 brave_env = {"BRAVE_API_KEY": os.getenv("BRAVE_API_KEY")}
 polygon_api_key = os.getenv("POLYGON_API_KEY")
 
-# The MCP server for the Trader to read Market Data
+# Servers only inherit a few variables by default, so a backtest passes on its database and price file
+# (backtest.py sets them before importing this module)
+backtest_env = {key: os.environ[key] for key in ["ACCOUNTS_DB", "BACKTEST_PRICES"] if os.getenv(key)}
+is_backtest = "BACKTEST_PRICES" in backtest_env
 
-if is_paid_polygon or is_realtime_polygon:
+
+def with_backtest_env(params: dict) -> dict:
+    return {**params, "env": {**params.get("env", {}), **backtest_env}} if backtest_env else params
+
+
+# The MCP server for the Trader to read Market Data; a backtest always uses the local one, on its simulated clock
+
+if (is_paid_polygon or is_realtime_polygon) and not is_backtest:
     market_mcp = {
         "command": "uvx",
         "args": ["--from", "git+https://github.com/polygon-io/mcp_polygon@v0.1.0", "mcp_polygon"],
         "env": {"POLYGON_API_KEY": polygon_api_key},
     }
 else:
-    market_mcp = {"command": "uv", "args": ["run", "market_server.py"]}
+    market_mcp = with_backtest_env({"command": "uv", "args": ["run", "market_server.py"]})
 
+accounts_mcp = with_backtest_env({"command": "uv", "args": ["run", "accounts_server.py"]})
 
 # The full set of MCP servers for the trader: Accounts, Push Notification and the Market
+# A backtest leaves out push notifications, which would otherwise arrive for every simulated day
 
-trader_mcp_server_params = [
-    {"command": "uv", "args": ["run", "accounts_server.py"]},
-    {"command": "uv", "args": ["run", "push_server.py"]},
-    market_mcp,
-]
+if is_backtest:
+    trader_mcp_server_params = [accounts_mcp, market_mcp]
+else:
+    trader_mcp_server_params = [accounts_mcp, {"command": "uv", "args": ["run", "push_server.py"]}, market_mcp]
 
 # The full set of MCP servers for the researcher: Fetch, Brave Search and Memory
 
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import time
+from agents.mcp import MCPServerStdio
+from mcp_retry import ResilientMCPServer
+
+HEALTH_CHECK_TIMEOUT_SECONDS = 10
+
+
+def server_key(params: dict) -> str:
+    """Servers launched with identical params are interchangeable, so they share one key"""
+    return json.dumps(params, sort_keys=True)
+
+
+def server_name(params: dict) -> str:
+    return " ".join(params["args"][-1:] or [params["command"]])
+
+
+class PooledServer:
+    """
+    One pooled server, connected and cleaned up by a task of its own, as the stdio transport must be
+    closed from the task that opened it; it is stopped by signalling that task, never from the caller's.
+    """
+
+    def __init__(self, params: dict):
+        self.server = ResilientMCPServer(params, name=server_name(params), cache_tools_list=True)
+        self._closing = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def _serve(self, ready: asyncio.Future) -> None:
+        try:
+            await self.server.connect()
+        except Exception as e:
+            ready.set_exception(e)
+            return
+        ready.set_result(None)
+        try:
+            await self._closing.wait()
+        finally:
+            await self.server.cleanup()
+
+    async def start(self) -> None:
+        ready = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._serve(ready))
+        await ready
+
+    async def stop(self) -> None:
+        self._closing.set()
+        if self._task:
+            try:
+                await self._task
+            except Exception as e:
+                print(f"Error stopping MCP server {self.server.name}: {e}")
+
+
+class MCPServerPool:
+    """
+    Keeps MCP server subprocesses alive across trading cycles.
+    Servers with identical params (accounts, push, market, fetch, brave) are shared by every trader;
+    servers whose params differ per trader, like the libsql memory, get one process each.
+    Each server lives in its own task, so any one of them can be restarted or closed on its own.
+    """
+
+    def __init__(self):
+        self._servers: dict[str, PooledServer] = {}
+        self.startup_seconds: dict[str, float] = {}
+        self.restarts = 0
+
+    async def _is_healthy(self, server: MCPServerStdio) -> bool:
+        if not server.session:
+            return False
+        try:
+            await asyncio.wait_for(server.session.send_ping(), HEALTH_CHECK_TIMEOUT_SECONDS)
+            return True
+        except Exception:
+            return False
+
+    async def _start(self, key: str, params: dict) -> float:
+        pooled = PooledServer(params)
+        start = time.perf_counter()
+        await pooled.start()
+        elapsed = time.perf_counter() - start
+        self._servers[key] = pooled
+        self.startup_seconds[key] = elapsed
+        return elapsed
+
+    async def _ensure(self, key: str, params: dict) -> float:
+        """Start the server if it isn't running or has stopped answering; return the seconds spent launching"""
+        pooled = self._servers.get(key)
+        if pooled:
+            if await self._is_healthy(pooled.server):
+                return 0.0
+            print(f"MCP server {pooled.server.name} is not responding; restarting it")
+            self.restarts += 1
+            del self._servers[key]
+            await pooled.stop()
+        return await self._start(key, params)
+
+    async def prepare(self, params_per_trader: list[list[dict]]) -> None:
+        """Make sure every server needed this cycle is up, then report the startup time saved"""
+        launched = 0.0
+        for params_list in params_per_trader:
+            for params in params_list:
+                launched += await self._ensure(server_key(params), params)
+        without_pool = sum(
+            self.startup_seconds[server_key(params)] for params_list in params_per_trader for params in params_list
+        )
+        print(
+            f"MCP pool: {len(self._servers)} servers running, {launched:.1f}s spent launching this cycle, "
+            f"about {without_pool - launched:.1f}s of startup saved"
+        )
+
+    def servers(self, params_list: list[dict]) -> list[MCPServerStdio]:
+        return [self._servers[server_key(params)].server for params in params_list]
+
+    async def close(self) -> None:
+        for pooled in self._servers.values():
+            await pooled.stop()
+        self._servers.clear()
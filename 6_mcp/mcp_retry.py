@@ -0,0 +1,174 @@
+import asyncio
+import random
+import re
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from agents.mcp import MCPServerStdio
+from mcp.types import CallToolResult, TextContent
+
+# Tool calls get an adaptive timeout between these bounds; until a server has answered a few calls,
+# it gets the most patient one
+MIN_TOOL_TIMEOUT_SECONDS = 10.0
+MAX_TOOL_TIMEOUT_SECONDS = 120.0
+WARMUP_CALLS = 3
+
+# Errors worth retrying, whether raised or returned by the tool as an error result
+TRANSIENT_ERROR = re.compile(
+    r"\b(429|500|502|503|504)\b|rate.?limit|too many requests|timed? ?out|temporar|unavailable|connection",
+    re.IGNORECASE,
+)
+RETRY_AFTER = re.compile(r"retry.?after\D{0,3}(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+@dataclass
+class RetryPolicy:
+    attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    # A tool that changes state, like a trade, may have gone through whatever error its call ended with,
+    # so it is never retried, and it waits the full MAX_TOOL_TIMEOUT_SECONDS rather than an adaptive timeout
+    idempotent: bool = True
+    # Consecutive failed calls that open the circuit, and how long it stays open before a trial call
+    failure_threshold: int = 5
+    reset_seconds: float = 60.0
+
+
+# Matched against the server's command line; the first match wins
+RETRY_POLICIES = {
+    "brave-search": RetryPolicy(attempts=4, base_delay=2.0, max_delay=60.0),
+    "mcp-server-fetch": RetryPolicy(attempts=2, base_delay=1.0),
+    "accounts_server.py": RetryPolicy(attempts=1, idempotent=False),
+    "push_server.py": RetryPolicy(attempts=1, idempotent=False),
+}
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+def retry_policy(params: dict) -> RetryPolicy:
+    command_line = " ".join([params["command"], *params.get("args", [])])
+    for pattern, policy in RETRY_POLICIES.items():
+        if pattern in command_line:
+            return policy
+    return DEFAULT_RETRY_POLICY
+
+
+@dataclass
+class ServerMetrics:
+    calls: int = 0
+    retries: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    short_circuits: int = 0
+    circuit_opens: int = 0
+    # Smoothed latency and its mean deviation, as TCP estimates round trip times
+    latency: float | None = None
+    deviation: float = 0.0
+    samples: int = 0
+
+    def record_latency(self, seconds: float) -> None:
+        self.samples += 1
+        if self.latency is None:
+            self.latency, self.deviation = seconds, seconds / 2
+        else:
+            self.deviation = 0.75 * self.deviation + 0.25 * abs(seconds - self.latency)
+            self.latency = 0.875 * self.latency + 0.125 * seconds
+
+    def timeout(self) -> float:
+        if self.samples < WARMUP_CALLS:
+            return MAX_TOOL_TIMEOUT_SECONDS
+        return min(MAX_TOOL_TIMEOUT_SECONDS, max(MIN_TOOL_TIMEOUT_SECONDS, self.latency + 4 * self.deviation))
+
+
+# Kept by server name, so the numbers survive a server being restarted
+server_metrics: dict[str, ServerMetrics] = {}
+
+
+def metrics_report() -> str:
+    return "\n".join(
+        f"{name}: {m.calls} calls, {m.retries} retries, {m.failures} failed, {m.timeouts} timed out, "
+        f"{m.short_circuits} short-circuited, circuit opened {m.circuit_opens}x, timeout now {m.timeout():.0f}s"
+        for name, m in server_metrics.items()
+    )
+
+
+class ResilientMCPServer(MCPServerStdio):
+    """
+    An MCPServerStdio whose tool calls are retried with exponential backoff and full jitter,
+    honouring any Retry-After the error mentions, behind a circuit breaker per server.
+    Each call's timeout adapts to the server's observed latency. Servers whose tools change state,
+    the accounts and push servers, are called once with a fixed timeout instead.
+    A call that still fails is returned to the model as an error result rather than raised,
+    so one flaky tool doesn't end the agent's whole run.
+    """
+
+    def __init__(self, params: dict, **kwargs):
+        kwargs.setdefault("client_session_timeout_seconds", MAX_TOOL_TIMEOUT_SECONDS)
+        super().__init__(params, **kwargs)
+        self.policy = retry_policy(params)
+        self.metrics = server_metrics.setdefault(self.name, ServerMetrics())
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def delay(self, attempt: int, error: str) -> float:
+        backoff = random.uniform(0, min(self.policy.max_delay, self.policy.base_delay * 2**attempt))
+        retry_after = RETRY_AFTER.search(error)
+        if retry_after:
+            backoff = max(backoff, min(self.policy.max_delay, float(retry_after.group(1))))
+        return backoff
+
+    def record_failure(self) -> None:
+        self.metrics.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.policy.failure_threshold:
+            # Also re-opens after a failed trial call, since the count is still past the threshold
+            self.open_until = time.monotonic() + self.policy.reset_seconds
+            self.metrics.circuit_opens += 1
+            print(f"MCP server {self.name} failed {self.consecutive_failures} calls in a row; pausing it")
+
+    def error_result(self, message: str) -> CallToolResult:
+        return CallToolResult(content=[TextContent(type="text", text=message)], isError=True)
+
+    async def attempt(self, tool_name: str, arguments: dict | None) -> tuple[CallToolResult | None, str, bool]:
+        """One call; returns the result if it succeeded, else the error and whether it is worth retrying"""
+        timeout = self.metrics.timeout() if self.policy.idempotent else MAX_TOOL_TIMEOUT_SECONDS
+        start = time.monotonic()
+        try:
+            result = await self.session.call_tool(
+                tool_name, arguments, read_timeout_seconds=timedelta(seconds=timeout)
+            )
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            timed_out = "timed out" in error.lower()
+            if timed_out:
+                self.metrics.timeouts += 1
+            return None, error, self.policy.idempotent and (timed_out or bool(TRANSIENT_ERROR.search(error)))
+        self.metrics.record_latency(time.monotonic() - start)
+        if result.isError:
+            error = " ".join(content.text for content in result.content if isinstance(content, TextContent))
+            if TRANSIENT_ERROR.search(error):
+                return None, error, self.policy.idempotent
+        return result, "", False
+
+    async def call_tool(self, tool_name: str, arguments: dict | None) -> CallToolResult:
+        if not self.session:
+            return await super().call_tool(tool_name, arguments)
+        self.metrics.calls += 1
+        if time.monotonic() < self.open_until:
+            self.metrics.short_circuits += 1
+            return self.error_result(
+                f"The {self.name} tools are temporarily unavailable after repeated failures; "
+                f"try again in {self.open_until - time.monotonic():.0f}s or continue without them."
+            )
+        error = ""
+        for attempt in range(self.policy.attempts):
+            if attempt:
+                self.metrics.retries += 1
+                await asyncio.sleep(self.delay(attempt - 1, error))
+            result, error, retryable = await self.attempt(tool_name, arguments)
+            if result:
+                self.consecutive_failures = 0
+                return result
+            if not retryable:
+                break
+        self.record_failure()
+        return self.error_result(f"Tool {tool_name} failed: {error}")
@@ -0,0 +1,172 @@
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+import httpx
+from agents import Model, OpenAIChatCompletionsModel, OpenAIResponsesModel
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+load_dotenv(override=True)
+
+# One pooled HTTP client per provider, shared by every trader and researcher
+MODEL_MAX_CONNECTIONS = int(os.getenv("MODEL_MAX_CONNECTIONS", "50"))
+MODEL_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("MODEL_MAX_KEEPALIVE_CONNECTIONS", "20"))
+MODEL_KEEPALIVE_SECONDS = float(os.getenv("MODEL_KEEPALIVE_SECONDS", "120"))
+# HTTP/2 multiplexes concurrent requests over one connection; httpx[http2] brings in the h2 package it needs
+MODEL_HTTP2 = os.getenv("MODEL_HTTP2", "true").strip().lower() == "true" and bool(importlib.util.find_spec("h2"))
+# A folder to store model responses in, keyed by model and prompt hash, so a run can be replayed; unset to disable
+MODEL_RESPONSE_CACHE = os.getenv("MODEL_RESPONSE_CACHE", "")
+# The prompts carry the current datetime, so these are blanked out of the key or a replay would never match
+TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?([+-]\d{2}:\d{2}|Z)?")
+
+
+@dataclass
+class ModelStats:
+    calls: int = 0
+    cache_hits: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+@dataclass
+class ConnectionStats:
+    requests: int = 0
+    connections: int = 0
+
+
+class ModelClientRegistry:
+    """
+    Hands out one AsyncOpenAI client per base URL and one model object per model name,
+    each wrapped to count calls, latency and tokens. Every client counts the HTTP requests it sends
+    and the TCP connections it had to open for them, which shows how well keep-alive is working.
+    """
+
+    def __init__(self):
+        self._clients: dict[str | None, AsyncOpenAI] = {}
+        self._models: dict[str, Model] = {}
+        self.model_stats: dict[str, ModelStats] = {}
+        self.connection_stats: dict[str, ConnectionStats] = {}
+
+    def client(self, base_url: str | None = None, api_key: str | None = None) -> AsyncOpenAI:
+        if base_url not in self._clients:
+            stats = self.connection_stats.setdefault(base_url or "openai", ConnectionStats())
+
+            async def trace(event: str, info: dict):
+                if event == "connection.connect_tcp.complete":
+                    stats.connections += 1
+
+            async def on_request(request: httpx.Request):
+                stats.requests += 1
+                request.extensions["trace"] = trace
+
+            http_client = DefaultAsyncHttpxClient(
+                http2=MODEL_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=MODEL_MAX_CONNECTIONS,
+                    max_keepalive_connections=MODEL_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=MODEL_KEEPALIVE_SECONDS,
+                ),
+                event_hooks={"request": [on_request]},
+            )
+            self._clients[base_url] = AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=http_client)
+        return self._clients[base_url]
+
+    def model(self, model_name: str, base_url: str | None = None, api_key: str | None = None) -> Model:
+        """The shared model for this name; OpenAI's own models use the Responses API, the rest Chat Completions"""
+        if model_name not in self._models:
+            client = self.client(base_url, api_key)
+            if base_url:
+                inner = OpenAIChatCompletionsModel(model=model_name, openai_client=client)
+            else:
+                inner = OpenAIResponsesModel(model=model_name, openai_client=client)
+            stats = self.model_stats.setdefault(model_name, ModelStats())
+            self._models[model_name] = InstrumentedModel(model_name, inner, stats, MODEL_RESPONSE_CACHE)
+        return self._models[model_name]
+
+    def report(self) -> str:
+        lines = []
+        for name, stats in self.model_stats.items():
+            average = stats.seconds / max(stats.calls - stats.cache_hits, 1)
+            lines.append(
+                f"{name}: {stats.calls} calls ({stats.cache_hits} cached, {stats.errors} failed), "
+                f"{average:.2f}s average, {stats.input_tokens:,} tokens in, {stats.output_tokens:,} out"
+            )
+        for base_url, stats in self.connection_stats.items():
+            lines.append(f"{base_url}: {stats.requests} requests over {stats.connections} new connections")
+        return "\n".join(lines)
+
+
+class InstrumentedModel(Model):
+    """Wraps a model to count its calls, latency and tokens, and optionally replay responses from disk"""
+
+    def __init__(self, model_name: str, inner: Model, stats: ModelStats, cache_folder: str = ""):
+        self.model_name = model_name
+        self.inner = inner
+        self.stats = stats
+        self.cache_folder = Path(cache_folder) if cache_folder else None
+
+    def cache_key(self, system_instructions, input, model_settings, tools, output_schema) -> str:
+        prompt = {
+            "model": self.model_name,
+            "instructions": system_instructions,
+            "input": input,
+            "settings": model_settings.to_json_dict(),
+            "tools": [(tool.name, getattr(tool, "params_json_schema", None)) for tool in tools],
+            "output": output_schema.json_schema() if output_schema and not output_schema.is_plain_text() else None,
+        }
+        text = TIMESTAMP.sub("<datetime>", json.dumps(prompt, sort_keys=True, default=str))
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    async def get_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+    ):
+        self.stats.calls += 1
+        path = None
+        if self.cache_folder:
+            key = self.cache_key(system_instructions, input, model_settings, tools, output_schema)
+            path = self.cache_folder / f"{key}.pkl"
+            if path.exists():
+                self.stats.cache_hits += 1
+                return pickle.loads(path.read_bytes())
+        start = time.perf_counter()
+        try:
+            response = await self.inner.get_response(
+                system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+            )
+        except Exception:
+            self.stats.errors += 1
+            raise
+        finally:
+            self.stats.seconds += time.perf_counter() - start
+        self.stats.input_tokens += response.usage.input_tokens
+        self.stats.output_tokens += response.usage.output_tokens
+        if path:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(pickle.dumps(response))
+        return response
+
+    async def stream_response(self, *args, **kwargs):
+        self.stats.calls += 1
+        start = time.perf_counter()
+        try:
+            async for event in self.inner.stream_response(*args, **kwargs):
+                if event.type == "response.completed" and event.response.usage:
+                    self.stats.input_tokens += event.response.usage.input_tokens
+                    self.stats.output_tokens += event.response.usage.output_tokens
+                yield event
+        except Exception:
+            self.stats.errors += 1
+            raise
+        finally:
+            self.stats.seconds += time.perf_counter() - start
+
+
+registry = ModelClientRegistry()
@@ -0,0 +1,69 @@
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+OHLC_FIELDS = ["open", "high", "low", "close"]
+BACKTEST_PRICE_FIELD = os.getenv("BACKTEST_PRICE_FIELD", "close")
+
+
+class OHLCStore:
+    """
+    Daily (or intraday) bars for many symbols, held as one dates array and one
+    dates x symbols matrix per OHLC field. Gaps are forward-filled; before a symbol's
+    first bar its price is NaN, which lookups report as 0.0 like an unknown symbol.
+    """
+
+    def __init__(self, path: str):
+        source = Path(path)
+        self.folder = source.with_name(source.stem + "_ohlc")
+        marker = self.folder / "symbols.json"
+        if not marker.exists() or marker.stat().st_mtime < source.stat().st_mtime:
+            self.convert(source, self.folder)
+        self.symbols = json.loads(marker.read_text())
+        self.columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.dates = np.load(self.folder / "dates.npy", mmap_mode="r")
+        self.bars = {field: np.load(self.folder / f"{field}.npy", mmap_mode="r") for field in OHLC_FIELDS}
+
+    @staticmethod
+    def convert(source: Path, folder: Path) -> None:
+        frame = pd.read_parquet(source) if source.suffix == ".parquet" else pd.read_csv(source)
+        frame.columns = [column.lower() for column in frame.columns]
+        frame["date"] = pd.to_datetime(frame["date"])
+        frame = frame.drop_duplicates(["date", "symbol"], keep="last")
+        wide = frame.pivot(index="date", columns="symbol", values=OHLC_FIELDS).sort_index().ffill()
+        folder.mkdir(exist_ok=True)
+        np.save(folder / "dates.npy", wide.index.to_numpy().astype("datetime64[s]"))
+        for field in OHLC_FIELDS:
+            np.save(folder / f"{field}.npy", wide[field].to_numpy(dtype=np.float64))
+        # Written last, so an interrupted conversion is redone on the next run
+        (folder / "symbols.json").write_text(json.dumps(list(wide[OHLC_FIELDS[0]].columns)))
+
+    def bar_index(self, when: datetime) -> int:
+        """The index of the latest bar at or before the given time, or -1 if there is none"""
+        return int(np.searchsorted(self.dates, np.datetime64(when, "s"), side="right")) - 1
+
+    def dates_between(self, start: datetime, end: datetime) -> list[datetime]:
+        first = np.searchsorted(self.dates, np.datetime64(start, "s"), side="left")
+        last = np.searchsorted(self.dates, np.datetime64(end, "s"), side="right")
+        return self.dates[first:last].astype(datetime).tolist()
+
+    def prices(self, symbols: list[str], when: datetime, field: str = BACKTEST_PRICE_FIELD) -> dict[str, float]:
+        i = self.bar_index(when)
+        row = self.bars[field][i] if i >= 0 else None
+        prices = {}
+        for symbol in symbols:
+            column = self.columns.get(symbol)
+            price = row[column] if row is not None and column is not None else np.nan
+            prices[symbol] = 0.0 if np.isnan(price) else float(price)
+        return prices
+
+    def history(self, symbol: str, when: datetime, length: int, field: str = BACKTEST_PRICE_FIELD) -> np.ndarray:
+        """Up to length bars of one symbol ending at the given time, oldest first"""
+        column = self.columns.get(symbol)
+        end = self.bar_index(when) + 1
+        if column is None or end <= 0:
+            return np.empty(0)
+        return self.bars[field][max(0, end - length):end, column]
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import random
+import time
+from dotenv import load_dotenv
+from traders import Trader, get_provider
+from mcp_pool import MCPServerPool
+from model_clients import registry
+from mcp_retry import server_metrics, metrics_report
+
+load_dotenv(override=True)
+
+# How many traders may talk to one model provider at once; override per provider with
+# e.g. PROVIDER_CONCURRENCY="openai=4,deepseek=1"
+DEFAULT_PROVIDER_CONCURRENCY = int(os.getenv("DEFAULT_PROVIDER_CONCURRENCY", "2"))
+PROVIDER_CONCURRENCY = {
+    provider.strip(): int(limit)
+    for provider, limit in (
+        entry.split("=") for entry in os.getenv("PROVIDER_CONCURRENCY", "").split(",") if "=" in entry
+    )
+}
+# Trader starts are spread over this fraction of the interval, each in its own jittered slot
+STAGGER_FRACTION = float(os.getenv("STAGGER_FRACTION", "0.2"))
+# Time a trader has from its scheduled start, including any wait for its provider, before it is cancelled
+TRADER_DEADLINE_FRACTION = float(os.getenv("TRADER_DEADLINE_FRACTION", "0.75"))
+
+
+class TradingScheduler:
+    """
+    Runs every trader once per interval on a fixed-rate clock, without waiting for the slowest.
+    Each trader starts at a jittered offset within the interval, waits for a slot on its
+    provider's semaphore and is cancelled at its deadline, so one slow trader can't hold back the others.
+    A trader still running when its next turn comes round skips that turn.
+    """
+
+    def __init__(self, traders: list[Trader], interval_seconds: float, mcp_pool: MCPServerPool):
+        self.traders = traders
+        self.interval = interval_seconds
+        self.mcp_pool = mcp_pool
+        self.deadline = interval_seconds * TRADER_DEADLINE_FRACTION
+        self.semaphores = {
+            provider: asyncio.Semaphore(PROVIDER_CONCURRENCY.get(provider, DEFAULT_PROVIDER_CONCURRENCY))
+            for provider in {get_provider(trader.model_name) for trader in traders}
+        }
+        self.running: dict[str, asyncio.Task] = {}
+        self.lags: dict[str, float] = {}
+        self.timeouts = 0
+        self.skipped = 0
+
+    def offsets(self) -> list[float]:
+        """A start offset per trader: evenly spaced slots across the stagger window, jittered within each slot"""
+        window = self.interval * STAGGER_FRACTION
+        slot = window / max(len(self.traders), 1)
+        order = random.sample(range(len(self.traders)), len(self.traders))
+        return [(order[i] + random.random()) * slot for i in range(len(self.traders))]
+
+    async def run_trader(self, trader: Trader, scheduled: float) -> None:
+        delay = scheduled - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        semaphore = self.semaphores[get_provider(trader.model_name)]
+        try:
+            async with asyncio.timeout(scheduled + self.deadline - time.monotonic()):
+                async with semaphore:
+                    self.lags[trader.name] = time.monotonic() - scheduled
+                    await trader.run(self.mcp_pool)
+        except TimeoutError:
+            self.timeouts += 1
+            print(f"Trader {trader.name} missed its {self.deadline:g}s deadline and was cancelled")
+
+    def is_idle(self, trader: Trader) -> bool:
+        task = self.running.get(trader.name)
+        return task is None or task.done()
+
+    def start_cycle(self, tick: float) -> None:
+        for trader, offset in zip(self.traders, self.offsets()):
+            if not self.is_idle(trader):
+                self.skipped += 1
+                print(f"Trader {trader.name} is still running from the last cycle; skipping this one")
+                continue
+            self.running[trader.name] = asyncio.create_task(self.run_trader(trader, tick + offset))
+
+    def report(self, tick_lag: float) -> None:
+        lags = ", ".join(f"{name} {lag:.1f}s" for name, lag in self.lags.items())
+        print(
+            f"Scheduler lag {tick_lag:.1f}s; last start lag per trader: {lags or 'none yet'}; "
+            f"{self.timeouts} timed out, {self.skipped} skipped"
+        )
+        if registry.model_stats:
+            print(registry.report())
+        if server_metrics:
+            print(metrics_report())
+
+    async def run_forever(self, should_run) -> None:
+        """Tick every interval; should_run() decides whether the traders trade this tick"""
+        tick = time.monotonic()
+        try:
+            while True:
+                tick_lag = time.monotonic() - tick
+                self.report(tick_lag)
+                if should_run():
+                    idle = [trader for trader in self.traders if self.is_idle(trader)]
+                    try:
+                        # Servers are started and health checked here, as the pool must be driven from one task
+                        await self.mcp_pool.prepare([trader.mcp_server_params() for trader in idle])
+                    except Exception as e:
+                        print(f"Could not start the MCP servers, skipping run: {e}")
+                    else:
+                        self.start_cycle(tick)
+                else:
+                    print("Market is closed, skipping run")
+                tick += self.interval
+                await asyncio.sleep(max(0.0, tick - time.monotonic()))
+        finally:
+            for task in self.running.values():
+                task.cancel()
+            await asyncio.gather(*self.running.values(), return_exceptions=True)
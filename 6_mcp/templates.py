@@ -1,12 +1,20 @@
-from datetime import datetime
-from market import is_paid_polygon, is_realtime_polygon
+from market import is_paid_polygon, is_realtime_polygon, market_time
+from mcp_params import is_backtest
 
 if is_realtime_polygon:
     note = "You have access to realtime market data tools; use your get_last_trade tool for the latest trade price. You can also use tools for share information, trends and technical indicators and fundamentals."
 elif is_paid_polygon:
     note = "You have access to market data tools but without access to the trade or quote tools; use your get_snapshot_ticker tool to get the latest share price on a 15 min delay. You can also use tools for share information, trends and technical indicators and fundamentals."
 else:
-    note = "You have access to end of day market data; use you get_share_price tool to get the share price as of the prior close."
+    note = "You have access to end of day market data; use you get_share_price tool to get the share price as of the prior close, or lookup_share_prices to price several symbols at once."
+
+# A backtest starts no push server, so its traders aren't asked to send notifications
+if is_backtest:
+    push_activity = ""
+    push_trades = ""
+else:
+    push_activity = "send a push notification with a brief summary of activity, then "
+    push_trades = "send a push notification with a brief sumnmary of trades and the health of the portfolio, then\n"
 
 
 def researcher_instructions():
@@ -24,7 +32,7 @@ Also use it to store web addresses that you find interesting so you can check th
 Draw on your knowledge graph to build your expertise over time.
 
 If there isn't a specific request, then just respond with investment opportunities based on searching latest news.
-The current datetime is {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+The current datetime is {market_time().strftime("%Y-%m-%d %H:%M:%S")}
 """
 
 def research_tool():
@@ -43,7 +51,7 @@ And you have tools to buy and sell stocks using your account name {name}.
 You can use your entity tools as a persistent memory to store and recall information; you share
 this memory with other traders and can benefit from the group's knowledge.
 Use these tools to carry out research, make decisions, and execute trades.
-After you've completed trading, send a push notification with a brief summary of activity, then reply with a 2-3 sentence appraisal.
+After you've completed trading, {push_activity}reply with a 2-3 sentence appraisal.
 Your goal is to maximize your profits according to your strategy.
 """
 
@@ -61,10 +69,9 @@ Your investment strategy:
 Here is your current account:
 {account}
 Here is the current datetime:
-{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+{market_time().strftime("%Y-%m-%d %H:%M:%S")}
 Now, carry out analysis, make your decision and execute trades. Your account name is {name}.
-After you've executed your trades, send a push notification with a brief sumnmary of trades and the health of the portfolio, then
-respond with a brief 2-3 sentence appraisal of your portfolio and its outlook.
+After you've executed your trades, {push_trades}respond with a brief 2-3 sentence appraisal of your portfolio and its outlook.
 """
 
 def rebalance_message(name, strategy, account):
@@ -80,7 +87,6 @@ You also have a tool to change your strategy if you wish; you can decide at any
 Here is your current account:
 {account}
 Here is the current datetime:
-{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+{market_time().strftime("%Y-%m-%d %H:%M:%S")}
 Now, carry out analysis, make your decision and execute trades. Your account name is {name}.
-After you've executed your trades, send a push notification with a brief sumnmary of trades and the health of the portfolio, then
-respond with a brief 2-3 sentence appraisal of your portfolio and its outlook."""
\ No newline at end of file
+After you've executed your trades, {push_trades}respond with a brief 2-3 sentence appraisal of your portfolio and its outlook."""
\ No newline at end of file
@@ -0,0 +1,38 @@
+import os
+import tempfile
+import unittest
+
+os.environ["ACCOUNTS_DB"] = os.path.join(tempfile.mkdtemp(), "test_analytics.db")
+
+from analytics import compute_analytics, get_analytics  # noqa: E402
+from database import write_account  # noqa: E402
+
+NO_HISTORY = {"balance": 10000.0, "strategy": "", "holdings": {}, "traded_value": 0.0}
+NO_STATS = ["total_return", "volatility", "sharpe", "sortino", "max_drawdown", "current_drawdown", "turnover"]
+
+
+class TestAnalyticsWithoutHistory(unittest.TestCase):
+    def test_account_with_no_history(self):
+        results = compute_analytics({"fresh": NO_HISTORY}, {"fresh": []})
+        self.assertEqual(results["fresh"]["points"], 0)
+        for stat in NO_STATS:
+            self.assertIsNone(results["fresh"][stat], stat)
+        self.assertEqual(results["fresh"]["invested"], 0.0)
+
+    def test_fresh_account_alongside_one_with_history(self):
+        history = [("2025-01-01 10:00:00", 10000.0), ("2025-01-01 11:00:00", 9000.0), ("2025-01-01 12:00:00", 9900.0)]
+        results = compute_analytics({"fresh": NO_HISTORY, "old": NO_HISTORY}, {"fresh": [], "old": history})
+        self.assertIsNone(results["fresh"]["max_drawdown"])
+        self.assertAlmostEqual(results["old"]["max_drawdown"], 0.1)
+        self.assertAlmostEqual(results["old"]["total_return"], -0.01)
+
+    def test_fresh_accounts_from_the_database(self):
+        for name in ["warren", "george"]:
+            write_account(name, NO_HISTORY)
+        results = get_analytics(["Warren", "George"])
+        self.assertEqual(set(results), {"warren", "george"})
+        self.assertIsNone(results["warren"]["sharpe"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,10 @@
 from contextlib import AsyncExitStack
 from accounts_client import read_accounts_resource, read_strategy_resource
 from tracers import make_trace_id
-from agents import Agent, Tool, Runner, OpenAIChatCompletionsModel, trace
-from openai import AsyncOpenAI
+from agents import Agent, Tool, Runner, trace
 from dotenv import load_dotenv
 import os
-import json
-from agents.mcp import MCPServerStdio
+from mcp_retry import ResilientMCPServer
 from templates import (
     researcher_instructions,
     trader_instructions,
@@ -15,6 +13,8 @@ from templates import (
     research_tool,
 )
 from mcp_params import trader_mcp_server_params, researcher_mcp_server_params
+from mcp_pool import MCPServerPool
+from model_clients import registry
 
 load_dotenv(override=True)
 
@@ -30,29 +30,39 @@ OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 
 MAX_TURNS = 30
 
-openrouter_client = AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=openrouter_api_key)
-deepseek_client = AsyncOpenAI(base_url=DEEPSEEK_BASE_URL, api_key=deepseek_api_key)
-grok_client = AsyncOpenAI(base_url=GROK_BASE_URL, api_key=grok_api_key)
-gemini_client = AsyncOpenAI(base_url=GEMINI_BASE_URL, api_key=google_api_key)
+# Base URL and key per provider; OpenAI's come from the environment
+provider_endpoints = {
+    "openrouter": (OPENROUTER_BASE_URL, openrouter_api_key),
+    "deepseek": (DEEPSEEK_BASE_URL, deepseek_api_key),
+    "grok": (GROK_BASE_URL, grok_api_key),
+    "gemini": (GEMINI_BASE_URL, google_api_key),
+    "openai": (None, None),
+}
 
 
-def get_model(model_name: str):
+def get_provider(model_name: str) -> str:
+    """The API a model is served by, matching the client get_model picks"""
     if "/" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=openrouter_client)
+        return "openrouter"
     elif "deepseek" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=deepseek_client)
+        return "deepseek"
     elif "grok" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=grok_client)
+        return "grok"
     elif "gemini" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=gemini_client)
+        return "gemini"
     else:
-        return model_name
+        return "openai"
+
+
+def get_model(model_name: str):
+    """The model shared by every agent using this name, over its provider's pooled client"""
+    return registry.model(model_name, *provider_endpoints[get_provider(model_name)])
 
 
 async def get_researcher(mcp_servers, model_name) -> Agent:
     researcher = Agent(
         name="Researcher",
-        instructions=researcher_instructions(),
+        instructions=lambda context, agent: researcher_instructions(),
         model=get_model(model_name),
         mcp_servers=mcp_servers,
     )
@@ -71,23 +81,27 @@ class Trader:
         self.agent = None
         self.model_name = model_name
         self.do_trade = True
+        self.agent_servers = None
+        # Without research the trader has no web tools; a backtest turns it off, as the web is from today
+        self.research = True
 
     async def create_agent(self, trader_mcp_servers, researcher_mcp_servers) -> Agent:
-        tool = await get_researcher_tool(researcher_mcp_servers, self.model_name)
+        # Instructions are rendered on each run, so the agent can be kept for as long as its servers are
+        if self.agent and self.agent_servers == (trader_mcp_servers, researcher_mcp_servers):
+            return self.agent
+        tools = [await get_researcher_tool(researcher_mcp_servers, self.model_name)] if self.research else []
+        self.agent_servers = (trader_mcp_servers, researcher_mcp_servers)
         self.agent = Agent(
             name=self.name,
-            instructions=trader_instructions(self.name),
+            instructions=lambda context, agent: trader_instructions(self.name),
             model=get_model(self.model_name),
-            tools=[tool],
+            tools=tools,
             mcp_servers=trader_mcp_servers,
         )
         return self.agent
 
     async def get_account_report(self) -> str:
-        account = await read_accounts_resource(self.name)
-        account_json = json.loads(account)
-        account_json.pop("portfolio_value_time_series", None)
-        return json.dumps(account_json)
+        return await read_accounts_resource(self.name)
 
     async def run_agent(self, trader_mcp_servers, researcher_mcp_servers):
         self.agent = await self.create_agent(trader_mcp_servers, researcher_mcp_servers)
@@ -100,32 +114,42 @@ class Trader:
         )
         await Runner.run(self.agent, message, max_turns=MAX_TURNS)
 
+    def researcher_server_params(self) -> list[dict]:
+        return researcher_mcp_server_params(self.name) if self.research else []
+
+    def mcp_server_params(self) -> list[dict]:
+        return trader_mcp_server_params + self.researcher_server_params()
+
+    async def run_with_mcp_pool(self, mcp_pool: MCPServerPool):
+        trader_mcp_servers = mcp_pool.servers(trader_mcp_server_params)
+        researcher_mcp_servers = mcp_pool.servers(self.researcher_server_params())
+        await self.run_agent(trader_mcp_servers, researcher_mcp_servers)
+
     async def run_with_mcp_servers(self):
         async with AsyncExitStack() as stack:
             trader_mcp_servers = [
-                await stack.enter_async_context(
-                    MCPServerStdio(params, client_session_timeout_seconds=120)
-                )
+                await stack.enter_async_context(ResilientMCPServer(params))
                 for params in trader_mcp_server_params
             ]
             async with AsyncExitStack() as stack:
                 researcher_mcp_servers = [
-                    await stack.enter_async_context(
-                        MCPServerStdio(params, client_session_timeout_seconds=120)
-                    )
-                    for params in researcher_mcp_server_params(self.name)
+                    await stack.enter_async_context(ResilientMCPServer(params))
+                    for params in self.researcher_server_params()
                 ]
                 await self.run_agent(trader_mcp_servers, researcher_mcp_servers)
 
-    async def run_with_trace(self):
+    async def run_with_trace(self, mcp_pool: MCPServerPool | None = None):
         trace_name = f"{self.name}-trading" if self.do_trade else f"{self.name}-rebalancing"
         trace_id = make_trace_id(f"{self.name.lower()}")
         with trace(trace_name, trace_id=trace_id):
-            await self.run_with_mcp_servers()
+            if mcp_pool:
+                await self.run_with_mcp_pool(mcp_pool)
+            else:
+                await self.run_with_mcp_servers()
 
-    async def run(self):
+    async def run(self, mcp_pool: MCPServerPool | None = None):
         try:
-            await self.run_with_trace()
+            await self.run_with_trace(mcp_pool)
         except Exception as e:
             print(f"Error running trader {self.name}: {e}")
         self.do_trade = not self.do_trade
@@ -4,6 +4,9 @@ import asyncio
 from tracers import LogTracer
 from agents import add_trace_processor
 from market import is_market_open
+from mcp_pool import MCPServerPool
+from scheduler import TradingScheduler
+from accounts_client import accounts_client
 from dotenv import load_dotenv
 import os
 
@@ -41,12 +44,13 @@ def create_traders() -> List[Trader]:
 async def run_every_n_minutes():
     add_trace_processor(LogTracer())
     traders = create_traders()
-    while True:
-        if RUN_EVEN_WHEN_MARKET_IS_CLOSED or is_market_open():
-            await asyncio.gather(*[trader.run() for trader in traders])
-        else:
-            print("Market is closed, skipping run")
-        await asyncio.sleep(RUN_EVERY_N_MINUTES * 60)
+    mcp_pool = MCPServerPool()
+    scheduler = TradingScheduler(traders, RUN_EVERY_N_MINUTES * 60, mcp_pool)
+    try:
+        await scheduler.run_forever(lambda: RUN_EVEN_WHEN_MARKET_IS_CLOSED or is_market_open())
+    finally:
+        await mcp_pool.close()
+        await accounts_client.close()
 
 
 if __name__ == "__main__":